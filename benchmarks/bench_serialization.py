@@ -0,0 +1,113 @@
+"""
+Microbenchmark for DTO building and JSON response encoding.
+
+Compares the old DTO builder (datetime.now() defaults computed for every field) with
+MessageService._to_dto, and Flask's stdlib provider with the orjson provider, on a
+page of 50 messages and 100 logs.
+
+Usage:
+python -m benchmarks.bench_serialization [--repeat 2000]
+"""
+
+from flask import Flask
+from bson import ObjectId
+from services.json_provider import OrjsonProvider, StdlibJSONProvider, orjson
+from services.message_service import MessageService
+from services.log_service import LogService
+import datetime
+import sys
+import timeit
+
+
+def legacy_message_dto(message):
+    """MessageService._to_dto before the fast builders"""
+    return {
+        "id": str(message["_id"]),
+        "sender_id": message["sender_id"],
+        "group_id": message["group_id"],
+        "content": message["content"],
+        "type": message.get("type", "text"),
+        "read_by": message.get("read_by", []),
+        "edited": message.get("edited", False),
+        "reply_to": message.get("reply_to"),
+        "created_at": message.get("created_at", datetime.datetime.now(datetime.timezone.utc)).isoformat(),
+        "updated_at": message.get("updated_at", datetime.datetime.now(datetime.timezone.utc)).isoformat()
+    }
+
+
+def sample_messages(count: int = 50):
+    now = datetime.datetime(2024, 1, 1, 12, 0, 0, 123000)
+    return [
+        {
+            "_id": ObjectId(),
+            "sender_id": str(ObjectId()),
+            "group_id": str(ObjectId()),
+            "content": f"Message number {i} with a bit of text in it",
+            "type": "text",
+            "read_by": [str(ObjectId()) for _ in range(3)],
+            "edited": False,
+            "reply_to": None,
+            "created_at": now + datetime.timedelta(seconds=i),
+            "updated_at": now + datetime.timedelta(seconds=i)
+        }
+        for i in range(count)
+    ]
+
+
+def sample_logs(count: int = 100):
+    now = datetime.datetime(2024, 1, 1, 12, 0, 0, 123000)
+    return [
+        {
+            "_id": ObjectId(),
+            "timestamp": now + datetime.timedelta(seconds=i),
+            "level": "INFO",
+            "message": f"Log entry {i}",
+            "url": "/api/groups",
+            "extra_data": {"user_id": str(ObjectId()), "status": 200}
+        }
+        for i in range(count)
+    ]
+
+
+def bench(label: str, func, repeat: int) -> float:
+    seconds = min(timeit.repeat(func, number=repeat, repeat=3))
+    per_call_us = seconds / repeat * 1e6
+    print(f"{label:<45} {per_call_us:>9.1f} us/op")
+    return per_call_us
+
+
+def main(argv) -> int:
+    repeat = int(argv[argv.index("--repeat") + 1]) if "--repeat" in argv else 2000
+
+    message_service = MessageService(None)
+    log_service = LogService(None)
+    messages = sample_messages()
+    logs = sample_logs()
+
+    print("DTO building (50 messages)")
+    old = bench("  legacy builder", lambda: [legacy_message_dto(m) for m in messages], repeat)
+    new = bench("  MessageService._to_dto", lambda: [message_service._to_dto(m) for m in messages], repeat)
+    print(f"  speedup: {old / new:.2f}x")
+
+    message_page = [message_service._to_dto(m) for m in messages]
+    log_page = {"logs": [log_service._to_dto(log) for log in logs], "total": len(logs)}
+
+    app = Flask(__name__)
+    stdlib = StdlibJSONProvider(app)
+    fast = OrjsonProvider(app) if orjson is not None else None
+
+    for label, payload in (("50 messages", message_page), ("100 logs", log_page)):
+        print(f"Response encoding ({label})")
+        with app.app_context():
+            old = bench("  stdlib provider", lambda: stdlib.response(payload), repeat)
+            if fast is None:
+                print("  orjson is not installed, skipping")
+                continue
+            new = bench("  orjson provider", lambda: fast.response(payload), repeat)
+        print(f"  speedup: {old / new:.2f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
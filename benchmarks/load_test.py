@@ -0,0 +1,332 @@
+"""
+Load test of the REST and Socket.IO paths against an in-process server.
+
+Boots server.py with a generated settings module and a mongomock stand-in (or a real
+MongoDB with --mongo-url), then runs one thread per simulated user. Each user registers,
+logs in, connects a Socket.IO client and joins groups; in every round it types, sends,
+reads and marks messages, syncs, pings and now and then reconnects. Latency percentiles
+and throughput are reported per endpoint and socket event.
+
+Timings depend on the machine, so compare runs made on the same one: --output writes a
+run as JSON (benchmarks/baseline.json is the committed reference) and --compare prints
+the change of each operation against such a file.
+
+Usage:
+python -m benchmarks.load_test [--users 40] [--groups 8] [--groups-per-user 3] [--rounds 15]
+                               [--reconnect-every 5] [--seed 1] [--mongo-url URL]
+                               [--output FILE] [--compare FILE] [--verbose]
+"""
+
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import types
+
+DEFAULT_MONGO_URL = "mongodb://localhost:27017/"
+SESSION_READY_TIMEOUT = 10.0
+
+
+def install_settings(mongo_url: str) -> None:
+    """Provide the settings module server.py imports, independent of a local settings.py"""
+    module = types.ModuleType("settings")
+    module.DB_CONNECTION_STRING = mongo_url
+    module.DB_NAME = f"chat_load_test_{os.getpid()}"
+    # Measure the indexed query plans; mongomock accepts the definitions and ignores them
+    module.ENSURE_INDEXES_ON_STARTUP = True
+    sys.modules["settings"] = module
+
+
+def boot_server(mongo_url: Optional[str]):
+    """Import server.py against mongomock (mongo_url None) or a real MongoDB"""
+    if mongo_url is None:
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("mongomock is not installed (`pip install mongomock`), or pass --mongo-url")
+        from services.mongo_client_registry import client_registry
+        client_registry.register_client(DEFAULT_MONGO_URL, mongomock.MongoClient())
+    install_settings(mongo_url or DEFAULT_MONGO_URL)
+    import server
+    if server.user_service is None:
+        raise SystemExit("The server could not connect to the database")
+    return server
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(fraction * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+class LatencyRecorder:
+    """Thread-safe latency samples and error counts per operation"""
+
+    def __init__(self):
+        self._samples: Dict[str, List[float]] = defaultdict(list)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self._samples[name].append(seconds)
+            if not ok:
+                self._errors[name] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        """count, errors, ops/s over the run and latency percentiles in ms per operation"""
+        result = {}
+        with self._lock:
+            for name in sorted(self._samples):
+                samples = sorted(self._samples[name])
+                result[name] = {
+                    "count": len(samples),
+                    "errors": self._errors.get(name, 0),
+                    "throughput": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+                    "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+                    "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+                    "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+                    "max_ms": round(samples[-1] * 1000, 3)
+                }
+        return result
+
+
+class SimulatedUser:
+    """One user with its own HTTP and Socket.IO test clients"""
+
+    def __init__(self, server, recorder: LatencyRecorder, index: int, rng: random.Random):
+        self.server = server
+        self.recorder = recorder
+        self.rng = rng
+        self.username = f"load_{os.getpid()}_{index}"
+        self.http = server.app.test_client()
+        self.socket = None
+        self.user_id: Optional[str] = None
+        self.group_ids: List[str] = []
+        self.cursor: Optional[str] = None
+
+    def call(self, label: str, method: str, url: str, **kwargs) -> Optional[Any]:
+        """Timed REST request, a status >= 400 counts as an error"""
+        start = time.perf_counter()
+        response = self.http.open(url, method=method, **kwargs)
+        self.recorder.record(label, time.perf_counter() - start, response.status_code < 400)
+        return response.get_json(silent=True)
+
+    def emit(self, event: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Timed socket event; the test client runs the handler synchronously"""
+        start = time.perf_counter()
+        if data is None:
+            self.socket.emit(event)
+        else:
+            self.socket.emit(event, data)
+        self.recorder.record(f"event {event}", time.perf_counter() - start)
+
+    def register(self) -> None:
+        body = self.call("POST /api/users/register", "POST", "/api/users/register",
+                         json={"username": self.username, "password": "load-test"})
+        self.user_id = body["user"]["id"]
+        self.call("POST /api/users/login", "POST", "/api/users/login",
+                  json={"username": self.username, "password": "load-test"})
+
+    def connect(self) -> None:
+        """Open a socket and wait until the session bootstrap has finished"""
+        start = time.perf_counter()
+        self.socket = self.server.socketio.test_client(self.server.app)
+        self.socket.emit("user_online", {"user_id": self.user_id})
+        ready = False
+        while not ready and time.perf_counter() - start < SESSION_READY_TIMEOUT:
+            ready = any(packet["name"] == "session_ready" for packet in self.socket.get_received())
+            if not ready:
+                time.sleep(0.001)
+        self.recorder.record("event user_online -> session_ready", time.perf_counter() - start, ready)
+
+    def disconnect(self) -> None:
+        start = time.perf_counter()
+        self.socket.disconnect()
+        self.recorder.record("event disconnect", time.perf_counter() - start)
+        self.socket = None
+
+    def join_groups(self, group_ids: List[str]) -> None:
+        for group_id in group_ids:
+            self.call("POST /api/groups/<group_id>/members/<user_id>", "POST",
+                      f"/api/groups/{group_id}/members/{self.user_id}")
+            self.group_ids.append(group_id)
+
+    def run_round(self, number: int, reconnect_every: int) -> None:
+        group_id = self.rng.choice(self.group_ids)
+        self.emit("typing_start", {"group_id": group_id, "user_id": self.user_id})
+        self.call("POST /api/groups/<group_id>/messages", "POST", f"/api/groups/{group_id}/messages",
+                  json={"sender_id": self.user_id, "content": f"round {number} from {self.username}"})
+        self.emit("typing_stop", {"group_id": group_id, "user_id": self.user_id})
+        self.call("GET /api/groups/<group_id>/messages", "GET",
+                  f"/api/groups/{group_id}/messages?user_id={self.user_id}&limit=50")
+        self.call("POST /api/groups/<group_id>/messages/mark-read", "POST",
+                  f"/api/groups/{group_id}/messages/mark-read", json={"user_id": self.user_id})
+        self.call("GET /api/users/<user_id>/unread", "GET", f"/api/users/{self.user_id}/unread")
+        self.call("GET /api/users/<user_id>/groups", "GET", f"/api/users/{self.user_id}/groups")
+        self.call("GET /api/suggest", "GET", f"/api/suggest?q={self.username[:8]}&limit=10")
+        self.call("GET /api/users/search", "GET", f"/api/users/search?q={self.username[-3:]}&limit=10")
+        self.call("GET /api/search/messages", "GET", f"/api/search/messages?q=round&user_id={self.user_id}&limit=20")
+        sync = self.call("GET /api/sync", "GET", f"/api/sync?user_id={self.user_id}&cursor={self.cursor or ''}")
+        if sync:
+            self.cursor = sync.get("cursor")
+        self.emit("ping")
+        self.socket.get_received()
+
+        if reconnect_every and number % reconnect_every == reconnect_every - 1:
+            self.disconnect()
+            self.connect()
+
+
+def run(server, args) -> Dict[str, Any]:
+    setup_recorder = LatencyRecorder()
+    rng = random.Random(args.seed)
+    users = [SimulatedUser(server, setup_recorder, index, random.Random(rng.random())) for index in range(args.users)]
+
+    # Setup is sequential so every run starts from the same data
+    setup_start = time.perf_counter()
+    for user in users:
+        user.register()
+    creators = users[:args.groups]
+    group_ids = []
+    for number, user in enumerate(creators):
+        body = user.call("POST /api/groups", "POST", "/api/groups",
+                         json={"name": f"Load group {number}", "creator_id": user.user_id})
+        group_ids.append(body["group"]["id"])
+        user.group_ids.append(body["group"]["id"])
+    for user in users:
+        candidates = [group_id for group_id in group_ids if group_id not in user.group_ids]
+        user.join_groups(user.rng.sample(candidates, min(len(candidates), args.groups_per_user)))
+    setup_elapsed = time.perf_counter() - setup_start
+
+    recorder = LatencyRecorder()
+    for user in users:
+        user.recorder = recorder
+    barrier = threading.Barrier(len(users) + 1)
+    failures = []
+
+    def simulate(user: SimulatedUser) -> None:
+        try:
+            barrier.wait()
+            user.connect()
+            for number in range(args.rounds):
+                user.run_round(number, args.reconnect_every)
+            user.disconnect()
+        except Exception as e:
+            failures.append(f"{user.username}: {e!r}")
+
+    threads = [threading.Thread(target=simulate, args=(user,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    operations = recorder.summary(elapsed)
+    return {
+        "config": {
+            "users": args.users,
+            "groups": args.groups,
+            "groups_per_user": args.groups_per_user,
+            "rounds": args.rounds,
+            "reconnect_every": args.reconnect_every,
+            "seed": args.seed,
+            "database": "mongodb" if args.mongo_url else "mongomock"
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "json_encoder": server.json_encoder
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "total_throughput": round(sum(op["count"] for op in operations.values()) / elapsed, 1),
+        "failed_users": failures,
+        "setup": setup_recorder.summary(setup_elapsed),
+        "operations": operations
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['config']['users']} users x {report['config']['rounds']} rounds "
+          f"on {report['config']['database']}: {report['elapsed_seconds']:.2f}s, "
+          f"{report['total_throughput']:.0f} ops/s")
+    for section in ("setup", "operations"):
+        print(f"{section:<52} {'count':>6} {'err':>4} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, op in report[section].items():
+            print(f"  {name:<50} {op['count']:>6} {op['errors']:>4} {op['throughput']:>8.1f} "
+                  f"{op['p50_ms']:>8.2f} {op['p95_ms']:>8.2f} {op['p99_ms']:>8.2f}")
+    for failure in report["failed_users"]:
+        print(f"✗ {failure}")
+    errors = error_count(report)
+    if errors:
+        print(f"✗ {errors} requests failed")
+
+
+def error_count(report: Dict[str, Any]) -> int:
+    return sum(op["errors"] for section in ("setup", "operations") for op in report[section].values())
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any], path: str) -> None:
+    """Ratio of p50/p95/p99 and throughput against the baseline (below 1.0 is faster)"""
+    if report["config"] != baseline.get("config"):
+        print("⚠️  The baseline was recorded with a different configuration")
+    print(f"{'change against ' + os.path.basename(path):<52} {'p50':>7} {'p95':>7} {'p99':>7} {'ops/s':>7}")
+    for section in ("setup", "operations"):
+        for name, op in report[section].items():
+            old = baseline.get(section, {}).get(name)
+            if old is None:
+                print(f"  {name:<50} {'new':>7}")
+                continue
+            ratios = [op[key] / old[key] if old[key] else 0.0 for key in ("p50_ms", "p95_ms", "p99_ms", "throughput")]
+            print(f"  {name:<50} " + " ".join(f"{ratio:>6.2f}x" for ratio in ratios))
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Load test of the REST and Socket.IO paths")
+    parser.add_argument("--users", type=int, default=40, help="concurrent simulated users")
+    parser.add_argument("--groups", type=int, default=8, help="groups created before the run")
+    parser.add_argument("--groups-per-user", type=int, default=3, help="groups every user joins")
+    parser.add_argument("--rounds", type=int, default=15, help="rounds of activity per user")
+    parser.add_argument("--reconnect-every", type=int, default=5, help="reconnect after every N rounds (0: never)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-url", help="run against a real MongoDB instead of mongomock")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--compare", help="compare with a report written by --output")
+    parser.add_argument("--verbose", action="store_true", help="show the server output")
+    args = parser.parse_args(argv)
+    args.groups = max(1, min(args.groups, args.users))
+
+    # The server logs every connection; keep the report readable
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        server = boot_server(args.mongo_url)
+        report = run(server, args)
+        if server.log_service and server.log_service.writer:
+            server.log_service.writer.flush()
+
+    print_report(report)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f), args.compare)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"✓ Report written to {args.output}")
+    return 1 if report["failed_users"] or error_count(report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
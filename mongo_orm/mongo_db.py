@@ -1,13 +1,12 @@
 from abstractions.data_access import repository, data_entity
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
+from services.mongo_client_registry import client_registry
 import pymongo
 
 
 class MongoRepository(repository.Repository):
     def __init__(self, mongo_connection_string: str, db_name: str, collection_name: str) -> None:
-        # Create a new client and connect to the server, receive a collection
-        self.collection = MongoClient(mongo_connection_string, server_api=ServerApi('1')).get_database(
+        # Reuse the shared client for this connection string, receive a collection
+        self.collection = client_registry.get_client(mongo_connection_string).get_database(
             db_name).get_collection(collection_name)
 
     def create(self, entity: data_entity.AbstractEntity) -> dict:
@@ -1,21 +1,69 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 from services.base_repository import BaseRepository
+from services.mongo_client_registry import client_registry
 from services.user_service import UserService
 from services.message_service import MessageService
 from services.group_service import GroupService
-from services.log_service import LogService
+from services.log_service import LogService, BufferedLogWriter
+from services.unread_service import UnreadCounterService
+from services.change_log_service import ChangeLogService, MESSAGE_CREATED, MESSAGE_EDITED, MESSAGE_DELETED
+from services.membership_cache import MembershipCache
+from services.autocomplete import PrefixIndex
+from services.message_cache import RecentMessageCache
+from services.membership_store import EmbeddedMembershipStore, CollectionMembershipStore
+from services.index_manager import IndexManager, required_indexes
+from services.broadcast_bus import create_realtime_backends
+from services.typing_service import TypingStateStore
+from services.session_bootstrap import SessionAdmissionQueue, StatusNotifier
+from services.presence_service import PresenceEngine
+from services.json_provider import install_json_provider, SocketJSON
+from services.metrics import MetricsRegistry, RequestMetrics, SocketEventMetrics, CONTENT_TYPE
+from services.mongo_monitoring import CommandMonitor
+import threading
 import settings
 import datetime
-from typing import Dict, Set
 import traceback
+import time
 from bson import ObjectId
 
 app = Flask(__name__)
 # Use a simple, permissive CORS configuration for development
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+# orjson encodes responses and socket packets when installed, with the stdlib encoder as fallback
+FAST_JSON = getattr(settings, "FAST_JSON", True)
+json_encoder = install_json_provider(app, FAST_JSON)
+# With REDIS_URL set, emits, socket tracking and room changes are shared by all workers
+REDIS_URL = getattr(settings, "REDIS_URL", None)
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=REDIS_URL,
+                    json=SocketJSON if FAST_JSON else None)
+socket_registry, broadcast_bus = create_realtime_backends(REDIS_URL)
+# Request, socket event and connection metrics are served on /metrics unless METRICS_ENABLED is off
+METRICS_ENABLED = getattr(settings, "METRICS_ENABLED", True)
+metrics = MetricsRegistry()
+socket_event_metrics = SocketEventMetrics(metrics)
+# MongoDB command latencies and the slowest commands; registered before the first client is created
+command_monitor = CommandMonitor(
+    metrics,
+    slow_ms=getattr(settings, "MONGO_SLOW_QUERY_MS", 100),
+    slow_log_size=getattr(settings, "MONGO_SLOW_QUERY_LOG_SIZE", 100)
+)
+if METRICS_ENABLED:
+    client_registry.event_listeners.append(command_monitor)
+    RequestMetrics(metrics, command_monitor).install(app)
+metrics.gauge("socketio_connected_sockets", "Sockets in the socket registry").set_function(socket_registry.socket_count)
+metrics.gauge("socketio_connected_users", "Users with at least one socket").set_function(socket_registry.user_count)
+# Upper bound for the id list of the /batch endpoints
+BATCH_MAX_SIZE = getattr(settings, "BATCH_MAX_SIZE", 100)
+# Typing indicators live only in memory and expire if typing_stop never arrives
+typing_store = TypingStateStore(
+    ttl=getattr(settings, "TYPING_TTL", 6.0),
+    throttle=getattr(settings, "TYPING_THROTTLE", 2.0)
+)
+# Sockets without a heartbeat for PRESENCE_TIMEOUT seconds (e.g. of a crashed worker) are expired
+PRESENCE_TIMEOUT = getattr(settings, "PRESENCE_TIMEOUT", 90.0)
+PRESENCE_FLUSH_INTERVAL = getattr(settings, "PRESENCE_FLUSH_INTERVAL", 1.0)
 
 # Initialize repositories and services with error handling
 try:
@@ -23,28 +71,105 @@ try:
     group_repo = BaseRepository(settings.DB_CONNECTION_STRING, settings.DB_NAME, "groups")
     message_repo = BaseRepository(settings.DB_CONNECTION_STRING, settings.DB_NAME, "messages")
     log_repo = BaseRepository(settings.DB_CONNECTION_STRING, settings.DB_NAME, "logs")
+    unread_repo = BaseRepository(settings.DB_CONNECTION_STRING, settings.DB_NAME, "unread_counters")
+    change_repo = BaseRepository(settings.DB_CONNECTION_STRING, settings.DB_NAME, "changes")
 
-    user_service = UserService(user_repo)
-    group_service = GroupService(group_repo)
-    message_service = MessageService(message_repo)
-    log_service = LogService(log_repo)
+    # "collection" keeps membership in group_members instead of arrays in the group document
+    if getattr(settings, "GROUP_MEMBERSHIP_STORAGE", "embedded") == "collection":
+        member_repo = BaseRepository(settings.DB_CONNECTION_STRING, settings.DB_NAME, "group_members")
+        membership_store = CollectionMembershipStore(member_repo, group_repo)
+    else:
+        member_repo = None
+        membership_store = EmbeddedMembershipStore(group_repo)
+
+    # Usernames and public group names are indexed in memory for autocomplete unless AUTOCOMPLETE_INDEX is off
+    autocomplete = getattr(settings, "AUTOCOMPLETE_INDEX", True)
+    # Status and last_active are written behind in batches by the presence loop
+    presence = PresenceEngine(socket_registry, user_repo, timeout=PRESENCE_TIMEOUT)
+    user_service = UserService(user_repo, PrefixIndex() if autocomplete else None, presence, typing_store)
+    group_service = GroupService(
+        group_repo,
+        MembershipCache(max_groups=getattr(settings, "MEMBERSHIP_CACHE_SIZE", 10000)),
+        membership_store,
+        PrefixIndex() if autocomplete else None,
+        typing_store
+    )
+    # The newest messages of active groups are served from memory unless RECENT_MESSAGES is 0
+    recent_messages = getattr(settings, "RECENT_MESSAGES", 50)
+    message_service = MessageService(
+        message_repo,
+        RecentMessageCache(
+            max_messages=recent_messages,
+            max_groups=getattr(settings, "RECENT_MESSAGES_MAX_GROUPS", 1000),
+            max_bytes=getattr(settings, "RECENT_MESSAGES_MAX_BYTES", 64 * 1024 * 1024)
+        ) if recent_messages else None
+    )
+    unread_service = UnreadCounterService(unread_repo)
+    change_log = ChangeLogService(change_repo, getattr(settings, "CHANGE_LOG_SETTLE_SECONDS", ChangeLogService.SETTLE_SECONDS))
+    # Audit logs are written in batches off the request path unless LOG_BUFFERING is disabled
+    log_writer = None
+    if getattr(settings, "LOG_BUFFERING", True):
+        log_writer = BufferedLogWriter(
+            log_repo,
+            flush_size=getattr(settings, "LOG_FLUSH_SIZE", 100),
+            flush_interval=getattr(settings, "LOG_FLUSH_INTERVAL", 1.0),
+            max_queue_size=getattr(settings, "LOG_QUEUE_SIZE", 10000),
+            overflow=getattr(settings, "LOG_QUEUE_OVERFLOW", "drop")
+        )
+    log_service = LogService(log_repo, log_writer)
     
     # Test the connection
     user_repo.count()
     print("✓ Successfully connected to MongoDB")
     
+    if autocomplete:
+        user_count = user_service.load_name_index()
+        group_count = group_service.load_name_index()
+        print(f"✓ Indexed {user_count} usernames and {group_count} public group names for autocomplete")
+    
+    # Create missing indexes: the ones correctness depends on always, the rest only when
+    # ENSURE_INDEXES_ON_STARTUP is set (same as `python -m services.index_manager`)
+    all_indexes = getattr(settings, "ENSURE_INDEXES_ON_STARTUP", False)
+    index_targets = [
+        (user_repo, UserService),
+        (group_repo, GroupService),
+        (message_repo, MessageService),
+        (log_repo, LogService),
+        (unread_repo, UnreadCounterService),
+        (change_repo, ChangeLogService)
+    ]
+    if member_repo is not None:
+        index_targets.append((member_repo, CollectionMembershipStore))
+    index_report = IndexManager([
+        (repository, service.INDEXES if all_indexes else required_indexes(service))
+        for repository, service in index_targets
+    ]).ensure_indexes()
+    for collection_name, result in index_report.items():
+        if result["created"]:
+            print(f"✓ Created indexes on {collection_name}: {', '.join(result['created'])}")
+        for index_name, error in result["failed"].items():
+            print(f"✗ Failed to create index {index_name} on {collection_name}: {error}")
+    
 except Exception as e:
     print(f"✗ Failed to connect to MongoDB: {e}")
     print("⚠️  Server will start but database operations will fail")
     # Create dummy services to prevent crashes
+    presence = PresenceEngine(socket_registry, timeout=PRESENCE_TIMEOUT)
     user_service = None
     group_service = None
     message_service = None
+    unread_service = None
+    change_log = None
     log_service = None
 
-# Track connected users
-connected_users: Dict[str, str] = {}  # socket_id -> user_id
-user_sockets: Dict[str, Set[str]] = {}  # user_id -> set of socket_ids
+
+def on_event(event: str):
+    """socketio.on that also records the handler in the socket event metrics"""
+    def decorator(handler):
+        if METRICS_ENABLED:
+            handler = socket_event_metrics.instrument(event, handler)
+        return socketio.on(event)(handler)
+    return decorator
 
 # =============================================================================
 # FAVICON ROUTE
@@ -79,6 +204,47 @@ def health_check():
         "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat()
     }), 200
 
+# =============================================================================
+# RUNTIME STATS
+# =============================================================================
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """In-process cache and pipeline counters used for capacity planning"""
+    stats = {}
+    if group_service:
+        stats["membership_cache"] = group_service.get_membership_cache_stats()
+    stats["mongo_pool"] = client_registry.pool_stats()
+    if message_service and message_service.recent_cache:
+        stats["recent_messages"] = message_service.get_recent_cache_stats()
+    if status_notifier:
+        stats["session_bootstrap"] = session_queue.stats()
+        stats["status_notifier"] = status_notifier.stats()
+    stats["presence"] = presence.stats()
+    if log_service and log_service.writer:
+        stats["log_writer"] = log_service.writer.stats()
+    stats["sockets"] = {
+        "connected_sockets": socket_registry.socket_count(),
+        "connected_users": socket_registry.user_count()
+    }
+    stats["json_encoder"] = json_encoder
+    return jsonify(stats), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Metrics of this worker in the Prometheus text format"""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/stats/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Recent MongoDB commands slower than MONGO_SLOW_QUERY_MS, with values redacted"""
+    return jsonify({
+        "threshold_ms": command_monitor.slow_ms,
+        "queries": command_monitor.slow_queries()
+    }), 200
+
 # =============================================================================
 # DATABASE CONNECTION CHECK DECORATOR
 # =============================================================================
@@ -99,8 +265,8 @@ def require_db_connection(f):
 @app.after_request
 def log_request(response):
     """Log successful requests to the database"""
-    # Don't log preflight OPTIONS requests, as they shouldn't have side effects
-    if request.method == 'OPTIONS':
+    # Don't log preflight OPTIONS requests, as they shouldn't have side effects, or metrics scrapes
+    if request.method == 'OPTIONS' or request.path == '/metrics':
         return response
     
     if response.status_code < 400 and log_service:
@@ -152,18 +318,196 @@ def handle_exception(e):
 # UTILITY FUNCTIONS
 # =============================================================================
 
+def user_room(user_id: str) -> str:
+    """Name of the Socket.IO room holding all sockets of a user"""
+    return f"user_{user_id}"
+
+def group_room(group_id: str) -> str:
+    """Name of the Socket.IO room that carries a group's broadcasts"""
+    return f"group_{group_id}"
+
 def emit_to_user(user_id: str, event: str, data: dict):
-    """Emit an event to all sockets of a specific user"""
-    if user_id in user_sockets:
-        for socket_id in user_sockets[user_id]:
-            socketio.emit(event, data, room=socket_id)
+    """Emit an event to all sockets of a specific user, on any worker"""
+    socketio.emit(event, data, room=user_room(user_id))
 
 def emit_to_group_members(group_id: str, event: str, data: dict, exclude_user: str = None):
-    """Emit an event to all members of a group"""
-    members = group_service.get_group_members(group_id)
-    for member_id in members:
-        if member_id != exclude_user:
-            emit_to_user(member_id, event, data)
+    """Emit an event to all members of a group through the group's room"""
+    # A single room emit replaces one emit per member socket and the members lookup
+    skip_sids = list(socket_registry.get_sockets(exclude_user)) if exclude_user else []
+    socketio.emit(event, data, room=group_room(group_id), skip_sid=skip_sids or None)
+
+def parse_batch_ids():
+    """Read {"ids": [...]} from a /batch request, return (ids, None) or (None, error response)"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(item_id, str) for item_id in ids):
+        return None, (jsonify({"error": "ids must be a list of strings"}), 400)
+    
+    # Duplicates are read once; the response keeps the order of first appearance
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_MAX_SIZE:
+        return None, (jsonify({"error": f"At most {BATCH_MAX_SIZE} ids per request"}), 400)
+    return ids, None
+
+def batch_response(ids, items):
+    """Batch result with the ids that were not found (or not valid ObjectIds)"""
+    found = {item['id'] for item in items}
+    return jsonify({
+        "items": items,
+        "missing": [item_id for item_id in ids if item_id not in found]
+    }), 200
+
+def sync_group_room(group_id: str, user_id: str, is_member: bool):
+    """Keep the group room in sync with membership for all connected sockets of a user"""
+    broadcast_bus.publish("membership", {
+        "group_id": group_id,
+        "user_id": user_id,
+        "is_member": is_member
+    })
+
+def apply_membership_change(message: dict):
+    """Apply a membership change published by any worker to this worker's sockets and caches"""
+    group_id = message["group_id"]
+    user_id = message["user_id"]
+    room = group_room(group_id)
+    for socket_id in socket_registry.get_local_sockets(user_id):
+        if message["is_member"]:
+            socketio.server.enter_room(socket_id, room, namespace='/')
+        else:
+            socketio.server.leave_room(socket_id, room, namespace='/')
+    
+    # The publishing worker already wrote the change through its own cache
+    if group_service and not broadcast_bus.is_local(message):
+        if message["is_member"]:
+            group_service.membership_cache.add_member(group_id, user_id)
+        else:
+            group_service.membership_cache.remove_member(group_id, user_id)
+
+broadcast_bus.subscribe("membership", apply_membership_change)
+
+def publish_messages_changed(group_id: str):
+    """Tell other workers that their cached newest messages of a group are stale"""
+    broadcast_bus.publish("messages", {"group_id": group_id})
+
+def apply_messages_changed(message: dict):
+    """Drop a group's cached messages after a write on another worker"""
+    if message_service and not broadcast_bus.is_local(message):
+        message_service.invalidate_recent(message["group_id"])
+
+broadcast_bus.subscribe("messages", apply_messages_changed)
+
+def publish_name_change(kind: str, item_id: str, name):
+    """Tell other workers to update their autocomplete index ("users" or "groups", None name removes)"""
+    broadcast_bus.publish("names", {"kind": kind, "id": item_id, "name": name})
+
+def apply_name_change(message: dict):
+    """Apply a username or public group name change made on another worker"""
+    if not user_service or broadcast_bus.is_local(message):
+        return
+    service = user_service if message["kind"] == "users" else group_service
+    if service.name_index is None:
+        return
+    if message["name"] is None:
+        service.name_index.remove(message["id"])
+    else:
+        service.name_index.add(message["id"], message["name"])
+
+broadcast_bus.subscribe("names", apply_name_change)
+
+def emit_typing_stopped(group_id: str, user_id: str):
+    """Tell the other group members that a user is no longer typing"""
+    emit_to_group_members(group_id, 'user_typing', {
+        'group_id': group_id,
+        'user_id': user_id,
+        'is_typing': False
+    }, exclude_user=user_id)
+
+def bootstrap_session(user_id: str, sids: list):
+    """Set a user online and subscribe their sockets to group rooms with a fixed number of queries"""
+    # Sockets that disconnected while waiting in the admission queue are skipped
+    sids = [sid for sid in sids if socket_registry.get_user(sid) == user_id]
+    if not sids:
+        return
+    
+    user_service.update_status(user_id, "online")
+    group_ids = group_service.get_user_group_ids(user_id)
+    rooms = [group_room(group_id) for group_id in group_ids]
+    for sid in sids:
+        for room in rooms:
+            socketio.server.enter_room(sid, room, namespace='/')
+        socketio.emit('session_ready', {'user_id': user_id, 'group_ids': group_ids}, to=sid)
+
+def deliver_presence_batch(changes: list, recipient_ids: list):
+    """Send one batch of status changes to the rooms of all recipients in a single emit"""
+    socketio.emit('presence_batch', {'changes': changes}, to=[user_room(user_id) for user_id in recipient_ids])
+
+session_queue = SessionAdmissionQueue(
+    bootstrap_session,
+    create_queue=socketio.server.eio.create_queue,
+    start_task=socketio.start_background_task,
+    workers=getattr(settings, "SESSION_BOOTSTRAP_WORKERS", 8),
+    max_pending=getattr(settings, "SESSION_BOOTSTRAP_MAX_PENDING", 10000)
+)
+status_notifier = StatusNotifier(user_service, deliver_presence_batch) if user_service else None
+STATUS_NOTIFY_INTERVAL = getattr(settings, "STATUS_NOTIFY_INTERVAL", 0.25)
+
+def notify_status_loop():
+    """Background task delivering coalesced friend status notifications once per tick"""
+    while True:
+        socketio.sleep(STATUS_NOTIFY_INTERVAL)
+        try:
+            status_notifier.flush()
+        except Exception as e:
+            print(f"Error notifying status changes: {e}")
+
+def presence_loop():
+    """Background task expiring dead sockets and writing queued status changes"""
+    # Heartbeats are refreshed a few times per timeout so one late round does not expire anybody
+    expire_interval = max(PRESENCE_TIMEOUT / 3, PRESENCE_FLUSH_INTERVAL)
+    next_expire = 0.0
+    next_reconcile = 0.0
+    while True:
+        try:
+            now = time.time()
+            if now >= next_reconcile:
+                next_reconcile = now + PRESENCE_TIMEOUT
+                presence.reconcile()
+            if now >= next_expire:
+                next_expire = now + expire_interval
+                for user_id in presence.expire(now):
+                    for group_id in typing_store.clear_user(user_id):
+                        emit_typing_stopped(group_id, user_id)
+                    status_notifier.notify(user_id, 'offline')
+            presence.flush()
+        except Exception as e:
+            print(f"Error updating presence: {e}")
+        socketio.sleep(PRESENCE_FLUSH_INTERVAL)
+
+def expire_typing_loop():
+    """Background task clearing typing indicators whose clients stopped refreshing them"""
+    while True:
+        socketio.sleep(1)
+        try:
+            for group_id, user_id in typing_store.expire():
+                emit_typing_stopped(group_id, user_id)
+        except Exception as e:
+            print(f"Error expiring typing state: {e}")
+
+_background_tasks_started = False
+_background_tasks_lock = threading.Lock()
+
+def start_background_tasks():
+    """Start the periodic Socket.IO background tasks once per process"""
+    global _background_tasks_started
+    with _background_tasks_lock:
+        if _background_tasks_started:
+            return
+        _background_tasks_started = True
+    socketio.start_background_task(expire_typing_loop)
+    if status_notifier:
+        socketio.start_background_task(notify_status_loop)
+        socketio.start_background_task(presence_loop)
+        session_queue.start()
 
 # =============================================================================
 # REST API ENDPOINTS
@@ -183,6 +527,7 @@ def register():
             return jsonify({"error": "Username and password required"}), 400
         
         user = user_service.create_user(username, password, profile_pic)
+        publish_name_change("users", user['id'], user['username'])
         return jsonify({"message": "User created successfully", "user": user}), 201
         
     except ValueError as e:
@@ -235,15 +580,29 @@ def get_user(user_id):
         print(f"Error in get_user: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/api/users/batch', methods=['POST'])
+@require_db_connection
+def get_users_batch():
+    """Get several users by ID in one request"""
+    try:
+        user_ids, error = parse_batch_ids()
+        if error:
+            return error
+        return batch_response(user_ids, user_service.find_by_ids(user_ids))
+        
+    except Exception as e:
+        print(f"Error in get_users_batch: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @app.route('/api/users/<user_id>', methods=['PUT'])
 @require_db_connection
 def update_user(user_id):
     """Update user data"""
     try:
         data = request.get_json()
-        success = user_service.update_user(user_id, data)
-        if success:
-            user = user_service.find_by_id(user_id)
+        user = user_service.update_user(user_id, data)
+        if user:
+            publish_name_change("users", user['id'], user['username'])
             return jsonify({"message": "User updated", "user": user}), 200
         return jsonify({"error": "Update failed"}), 400
     except Exception as e:
@@ -287,7 +646,10 @@ def search_users():
 @require_db_connection
 def get_online_users():
     """Get all online users"""
-    users = user_service.get_online_users()
+    # Served from live presence, the stored status may lag behind by one flush
+    users = user_service.find_by_ids(presence.online_user_ids())
+    for user in users:
+        user["status"] = "online"
     return jsonify(users), 200
 
 # =============================================================================
@@ -309,6 +671,9 @@ def create_group():
             return jsonify({"error": "Name and creator_id required"}), 400
         
         group = group_service.create_group(name, creator_id, description, is_private)
+        sync_group_room(group['id'], creator_id, True)
+        change_log.record_membership(group['id'], creator_id, True)
+        publish_name_change("groups", group['id'], None if group['is_private'] else group['name'])
         return jsonify({"message": "Group created", "group": group}), 201
         
     except Exception as e:
@@ -338,6 +703,22 @@ def get_group(group_id):
         print(f"Error in get_group: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/api/groups/batch', methods=['POST'])
+@require_db_connection
+def get_groups_batch():
+    """Get several groups by ID in one request"""
+    try:
+        group_ids, error = parse_batch_ids()
+        if error:
+            return error
+        
+        groups = group_service.get_groups(group_ids)
+        return batch_response(group_ids, groups)
+        
+    except Exception as e:
+        print(f"Error in get_groups_batch: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @app.route('/api/groups/<group_id>', methods=['PUT'])
 @require_db_connection
 def update_group(group_id):
@@ -349,9 +730,9 @@ def update_group(group_id):
         if not requester_id:
             return jsonify({"error": "requester_id required"}), 400
         
-        success = group_service.update_group(group_id, data, requester_id)
-        if success:
-            group = group_service.get_group(group_id)
+        group = group_service.update_group(group_id, data, requester_id)
+        if group:
+            publish_name_change("groups", group['id'], None if group['is_private'] else group['name'])
             return jsonify({"message": "Group updated", "group": group}), 200
         return jsonify({"error": "Update failed or insufficient permissions"}), 400
         
@@ -383,6 +764,8 @@ def join_group(group_id, user_id):
         
         success = group_service.add_member(group_id, user_id)
         if success:
+            sync_group_room(group_id, user_id, True)
+            change_log.record_membership(group_id, user_id, True)
             # Notify group members
             emit_to_group_members(group_id, 'user_joined', {
                 'group_id': group_id,
@@ -420,6 +803,9 @@ def leave_group(group_id, user_id):
         
         success = group_service.remove_member(group_id, user_id)
         if success:
+            sync_group_room(group_id, user_id, False)
+            change_log.record_membership(group_id, user_id, False)
+            unread_service.remove(group_id, user_id)
             # Notify group members
             emit_to_group_members(group_id, 'user_left', {
                 'group_id': group_id,
@@ -432,6 +818,29 @@ def leave_group(group_id, user_id):
         print(f"Error in leave_group: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/api/groups/<group_id>/members', methods=['GET'])
+@require_db_connection
+def list_group_members(group_id):
+    """Get a page of group members (use the last user_id as `after` for the next page)"""
+    try:
+        try:
+            ObjectId(group_id)
+        except Exception:
+            return jsonify({"error": "Invalid group_id format"}), 400
+
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        after = request.args.get('after')
+
+        members = group_service.list_members(group_id, limit, after)
+        return jsonify({
+            "members": members,
+            "next_after": members[-1]["user_id"] if len(members) == limit else None
+        }), 200
+
+    except Exception as e:
+        print(f"Error in list_group_members: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @app.route('/api/users/<user_id>/groups', methods=['GET'])
 @require_db_connection
 def get_user_groups(user_id):
@@ -492,10 +901,23 @@ def send_message(group_id):
             message = message_service.create_reply(sender_id, group_id, content, reply_to, message_type)
         else:
             message = message_service.create_message(sender_id, group_id, content, message_type)
+        publish_messages_changed(group_id)
+        change_log.record_message(MESSAGE_CREATED, message)
         
         # Update group's last activity
         group_service.update_last_activity(group_id)
         
+        # Count the message as unread for everyone else and push the change
+        unread_service.increment_for_group(group_id, sender_id)
+        emit_to_group_members(group_id, 'unread_count_changed', {
+            'group_id': group_id,
+            'delta': 1
+        }, exclude_user=sender_id)
+        
+        # Sending a message ends the sender's typing indicator
+        if typing_store.stop(group_id, sender_id):
+            emit_typing_stopped(group_id, sender_id)
+        
         # Emit real-time message to group members
         emit_to_group_members(group_id, 'new_message', message)
         
@@ -541,6 +963,20 @@ def get_messages(group_id):
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/api/messages/batch', methods=['POST'])
+@require_db_connection
+def get_messages_batch():
+    """Get several messages by ID in one request"""
+    try:
+        message_ids, error = parse_batch_ids()
+        if error:
+            return error
+        return batch_response(message_ids, message_service.get_messages(message_ids))
+        
+    except Exception as e:
+        print(f"Error in get_messages_batch: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @app.route('/api/messages/<message_id>', methods=['PUT'])
 @require_db_connection
 def edit_message(message_id):
@@ -553,9 +989,10 @@ def edit_message(message_id):
         if not new_content or not user_id:
             return jsonify({"error": "content and user_id required"}), 400
         
-        success = message_service.edit_message(message_id, new_content, user_id)
-        if success:
-            message = message_service.get_message(message_id)
+        message = message_service.edit_message(message_id, new_content, user_id)
+        if message:
+            publish_messages_changed(message['group_id'])
+            change_log.record_message(MESSAGE_EDITED, message)
             # Emit message update to group members
             emit_to_group_members(message['group_id'], 'message_edited', message)
             return jsonify({"message": "Message updated", "data": message}), 200
@@ -575,18 +1012,21 @@ def delete_message(message_id):
         if not user_id:
             return jsonify({"error": "user_id required"}), 400
         
-        message = message_service.get_message(message_id)
-        if not message:
-            return jsonify({"error": "Message not found"}), 404
-        
-        success = message_service.delete_message(message_id, user_id)
-        if success:
+        message = message_service.delete_message(message_id, user_id)
+        if message:
+            publish_messages_changed(message['group_id'])
+            change_log.record_message(MESSAGE_DELETED, message)
+            unread_service.decrement_for_group(message['group_id'], message['read_by'])
             # Emit message deletion to group members
             emit_to_group_members(message['group_id'], 'message_deleted', {
                 'message_id': message_id,
                 'group_id': message['group_id']
             })
             return jsonify({"message": "Message deleted"}), 200
+        
+        # Only look the message up again to tell a missing message from a permission failure
+        if not message_service.get_message(message_id):
+            return jsonify({"error": "Message not found"}), 404
         return jsonify({"error": "Delete failed or insufficient permissions"}), 400
         
     except Exception as e:
@@ -626,6 +1066,16 @@ def mark_messages_read(group_id):
                 pass
         
         count = message_service.mark_group_messages_as_read(group_id, user_id, up_to_date)
+        if count:
+            publish_messages_changed(group_id)
+        
+        # Reading up to a timestamp may leave newer messages unread, so recount in that case
+        unread_count = message_service.get_unread_count(group_id, user_id) if up_to_date else 0
+        unread_service.set_count(group_id, user_id, unread_count)
+        emit_to_user(user_id, 'unread_count_changed', {
+            'group_id': group_id,
+            'count': unread_count
+        })
         return jsonify({"message": f"Marked {count} messages as read"}), 200
         
     except Exception as e:
@@ -635,9 +1085,107 @@ def mark_messages_read(group_id):
 @require_db_connection
 def get_unread_counts(user_id):
     """Get unread message counts for all groups"""
-    counts = message_service.get_unread_messages(user_id)
+    # One counter read per group of the user; groups without a counter yet are counted once
+    group_ids = group_service.get_user_group_ids(user_id)
+    counts = unread_service.get_counts(
+        user_id,
+        group_ids,
+        backfill=lambda group_id: message_service.get_unread_count(group_id, user_id)
+    )
     return jsonify(counts), 200
 
+# =============================================================================
+# SYNC ENDPOINT
+# =============================================================================
+
+@app.route('/api/sync', methods=['GET'])
+@require_db_connection
+def sync_changes():
+    """Everything that changed in the user's groups since the cursor, in one response"""
+    try:
+        user_id = request.args.get('user_id')
+        if not user_id:
+            return jsonify({"error": "user_id required"}), 400
+        
+        try:
+            limit = min(max(int(request.args.get('limit', 500)), 1), 1000)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        
+        group_ids = group_service.get_user_group_ids(user_id)
+        result = change_log.get_changes(user_id, group_ids, request.args.get('cursor'), limit)
+        return jsonify(result), 200
+        
+    except Exception as e:
+        print(f"Error in sync_changes: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+# =============================================================================
+# SEARCH ENDPOINTS
+# =============================================================================
+
+@app.route('/api/suggest', methods=['GET'])
+@require_db_connection
+def suggest():
+    """Autocomplete usernames and public group names by prefix, served from memory"""
+    prefix = request.args.get('q', '').strip()
+    kind = request.args.get('type', 'all')
+    if kind not in ('all', 'users', 'groups'):
+        return jsonify({"error": "type must be all, users or groups"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    
+    result = {}
+    if kind in ('all', 'users'):
+        result["users"] = user_service.suggest_users(prefix, limit)
+    if kind in ('all', 'groups'):
+        result["groups"] = group_service.suggest_groups(prefix, limit)
+    return jsonify(result), 200
+
+@app.route('/api/search/messages', methods=['GET'])
+@require_db_connection
+def search_messages():
+    """Full-text message search in one group or across all groups of the user"""
+    try:
+        query = request.args.get('q', '').strip()
+        user_id = request.args.get('user_id')
+        group_id = request.args.get('group_id')
+        
+        if not query or not user_id:
+            return jsonify({"error": "q and user_id required"}), 400
+        
+        try:
+            page = max(int(request.args.get('page', 1)), 1)
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        except ValueError:
+            return jsonify({"error": "page and limit must be integers"}), 400
+        
+        # Results are limited to groups the requester belongs to
+        if group_id:
+            if not group_service.is_member(group_id, user_id):
+                return jsonify({"error": "User is not a member of this group"}), 403
+            group_ids = [group_id]
+        else:
+            group_ids = group_service.get_user_group_ids(user_id)
+        
+        skip = (page - 1) * limit
+        if skip + limit > MessageService.MAX_SEARCH_WINDOW:
+            return jsonify({"error": f"Only the first {MessageService.MAX_SEARCH_WINDOW} results can be paged"}), 400
+        
+        result = message_service.search(query, group_ids, skip, limit)
+        return jsonify({
+            "results": result["results"],
+            "page": page,
+            "limit": limit,
+            "has_more": result["has_more"]
+        }), 200
+        
+    except Exception as e:
+        print(f"Error in search_messages: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
 # =============================================================================
 # LOGGING ENDPOINTS
 # =============================================================================
@@ -652,6 +1200,18 @@ def get_logs():
         # Parse query parameters
         limit = int(request.args.get('limit', 100))
         level = request.args.get('level')
+        
+        # Keyset mode: any 'cursor' parameter (empty for the first page) switches to seek pagination
+        if 'cursor' in request.args:
+            if limit < 1 or limit > 1000:
+                return jsonify({"error": "Invalid parameter: limit must be between 1 and 1000"}), 400
+            include_total = request.args.get('include_total', '').lower() in ('1', 'true')
+            try:
+                result = log_service.get_logs_page(limit, level, request.args.get('cursor') or None, include_total)
+            except ValueError:
+                return jsonify({"error": "Invalid 'cursor' value"}), 400
+            return jsonify(result), 200
+        
         before = request.args.get('before')
         skip = int(request.args.get('skip', 0))
         page = request.args.get('page')
@@ -710,9 +1270,10 @@ def get_logs_simple():
 # WEBSOCKET EVENTS
 # =============================================================================
 
-@socketio.on('connect')
+@on_event('connect')
 def handle_connect():
     """Handle client connection"""
+    start_background_tasks()
     if log_service:
         try:
             log_service.create_log(
@@ -725,10 +1286,10 @@ def handle_connect():
             print(f"Failed to log connection: {e}")
     print(f"Client connected: {request.sid}")
 
-@socketio.on('disconnect')
+@on_event('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
-    user_id = connected_users.get(request.sid)
+    user_id = socket_registry.get_user(request.sid)
     if log_service:
         try:
             log_service.create_log(
@@ -741,33 +1302,22 @@ def handle_disconnect():
             print(f"Failed to log disconnection: {e}")
     print(f"Client disconnected: {request.sid}")
     
-    # Remove user from connected users
-    if request.sid in connected_users:
-        user_id = connected_users[request.sid]
-        
-        # Remove socket from user's socket set
-        if user_id in user_sockets:
-            user_sockets[user_id].discard(request.sid)
+    # Remove socket from the registry
+    user_id, was_last_socket = presence.disconnect(request.sid)
+    
+    # If user has no more sockets on any worker, set them offline
+    if user_id and was_last_socket and user_service:
+        for group_id in typing_store.clear_user(user_id):
+            emit_typing_stopped(group_id, user_id)
+        try:
+            user_service.update_status(user_id, "offline")
             
-            # If user has no more sockets, set them offline
-            if not user_sockets[user_id] and user_service:
-                try:
-                    user_service.update_status(user_id, "offline")
-                    del user_sockets[user_id]
-                    
-                    # Notify friends that user went offline
-                    friends = user_service.get_friends(user_id)
-                    for friend in friends:
-                        emit_to_user(friend['id'], 'user_status_changed', {
-                            'user_id': user_id,
-                            'status': 'offline'
-                        })
-                except Exception as e:
-                    print(f"Failed to update user status on disconnect: {e}")
-        
-        del connected_users[request.sid]
-
-@socketio.on('user_online')
+            # Friends are notified in the next batch
+            status_notifier.notify(user_id, 'offline')
+        except Exception as e:
+            print(f"Failed to update user status on disconnect: {e}")
+
+@on_event('user_online')
 def handle_user_online(data):
     """Handle user coming online"""
     user_id = data.get('user_id')
@@ -789,35 +1339,16 @@ def handle_user_online(data):
         except Exception as e:
             print(f"Failed to log user online: {e}")
     
-    # Track the connection
-    connected_users[request.sid] = user_id
-    
-    if user_id not in user_sockets:
-        user_sockets[user_id] = set()
-    user_sockets[user_id].add(request.sid)
+    # Track the connection; friends hear about the first socket in the next presence batch
+    if presence.connect(request.sid, user_id):
+        status_notifier.notify(user_id, 'online')
+    join_room(user_room(user_id))
     
-    try:
-        # Update user status to online
-        user_service.update_status(user_id, "online")
-        
-        # Notify friends that user is online
-        friends = user_service.get_friends(user_id)
-        for friend in friends:
-            emit_to_user(friend['id'], 'user_status_changed', {
-                'user_id': user_id,
-                'status': 'online'
-            })
-        
-        # Join user to their group rooms
-        if group_service:
-            groups = group_service.get_user_groups(user_id)
-            for group in groups:
-                join_room(f"group_{group['id']}")
-    except Exception as e:
-        print(f"Error handling user online: {e}")
-        emit('error', {'message': 'Failed to set user online'})
+    # Status and group rooms are handled by the bootstrap workers
+    if not session_queue.submit(user_id, request.sid):
+        emit('server_busy', {'retry_after': 5})
 
-@socketio.on('join_group')
+@on_event('join_group')
 def handle_join_group(data):
     """Handle user joining a group room"""
     group_id = data.get('group_id')
@@ -826,39 +1357,39 @@ def handle_join_group(data):
     if group_id and user_id and group_service:
         try:
             if group_service.is_member(group_id, user_id):
-                join_room(f"group_{group_id}")
+                join_room(group_room(group_id))
                 emit('joined_group', {'group_id': group_id})
         except Exception as e:
             print(f"Error joining group: {e}")
             emit('error', {'message': 'Failed to join group'})
 
-@socketio.on('leave_group')
+@on_event('leave_group')
 def handle_leave_group(data):
     """Handle user leaving a group room"""
     group_id = data.get('group_id')
     if group_id:
-        leave_room(f"group_{group_id}")
+        # Group broadcasts are delivered through the room, so members stay subscribed
+        user_id = socket_registry.get_user(request.sid)
+        if not (user_id and group_service and group_service.is_member(group_id, user_id)):
+            leave_room(group_room(group_id))
         emit('left_group', {'group_id': group_id})
 
-@socketio.on('typing_start')
+@on_event('typing_start')
 def handle_typing_start(data):
     """Handle user starting to type"""
     group_id = data.get('group_id')
     user_id = data.get('user_id')
     
-    if group_id and user_id and group_service and user_service:
+    if group_id and user_id and group_service:
         try:
-            if group_service.is_member(group_id, user_id):
+            # Keystroke bursts only refresh the expiry; a broadcast goes out at most once per throttle window
+            if group_service.is_member(group_id, user_id) and typing_store.start(group_id, user_id):
                 if log_service:
                     try:
                         log_service.create_log(f"User {user_id} started typing in group {group_id}", request.url, "DEBUG", data)
                     except:
                         pass
                 
-                # Update typing status in services
-                group_service.set_user_typing(group_id, user_id, True)
-                user_service.set_typing_status(user_id, group_id, True)
-                
                 # Notify other group members
                 emit_to_group_members(group_id, 'user_typing', {
                     'group_id': group_id,
@@ -868,36 +1399,30 @@ def handle_typing_start(data):
         except Exception as e:
             print(f"Error handling typing start: {e}")
 
-@socketio.on('typing_stop')
+@on_event('typing_stop')
 def handle_typing_stop(data):
     """Handle user stopping typing"""
     group_id = data.get('group_id')
     user_id = data.get('user_id')
     
-    if group_id and user_id and group_service and user_service:
+    if group_id and user_id:
         try:
-            if log_service:
-                try:
-                    log_service.create_log(f"User {user_id} stopped typing in group {group_id}", request.url, "DEBUG", data)
-                except:
-                    pass
-            
-            # Update typing status in services
-            group_service.set_user_typing(group_id, user_id, False)
-            user_service.set_typing_status(user_id, group_id, False)
-            
-            # Notify other group members
-            emit_to_group_members(group_id, 'user_typing', {
-                'group_id': group_id,
-                'user_id': user_id,
-                'is_typing': False
-            }, exclude_user=user_id)
+            if typing_store.stop(group_id, user_id):
+                if log_service:
+                    try:
+                        log_service.create_log(f"User {user_id} stopped typing in group {group_id}", request.url, "DEBUG", data)
+                    except:
+                        pass
+                
+                # Notify other group members
+                emit_typing_stopped(group_id, user_id)
         except Exception as e:
             print(f"Error handling typing stop: {e}")
 
-@socketio.on('ping')
+@on_event('ping')
 def handle_ping():
     """Handle ping for keepalive"""
+    presence.heartbeat(request.sid)
     emit('pong')
 
 # =============================================================================
@@ -0,0 +1,93 @@
+from typing import Dict, List, Iterable, Tuple
+import bisect
+import re
+import threading
+import unicodedata
+
+_WORD_SPLIT = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Case-fold and strip accents so 'Émile' is found by 'emi'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def _tokens(name: str) -> List[str]:
+    """The whole normalized name plus each of its words, so 'Team Chat' matches 'team' and 'cha'"""
+    full = normalize(name)
+    if not full:
+        return []
+    words = [word for word in _WORD_SPLIT.split(full) if word and word != full]
+    return sorted(set([full] + words))
+
+
+class PrefixIndex:
+    """
+    In-memory autocomplete index of id -> display name.
+
+    Keeps a sorted list of (token, id) pairs; a lookup is a binary search to the first
+    token with the prefix followed by a scan over the matches only, so it does not
+    depend on the number of indexed names.
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[str, str]] = []
+        self._names: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Replace the index contents with (id, name) pairs, return the number of names"""
+        names = {item_id: name for item_id, name in items if name}
+        entries = sorted((token, item_id) for item_id, name in names.items() for token in _tokens(name))
+        with self._lock:
+            self._names = names
+            self._entries = entries
+        return len(names)
+
+    def add(self, item_id: str, name: str) -> None:
+        """Index a new name or replace the name of an existing id"""
+        with self._lock:
+            self._remove(item_id)
+            if not name:
+                return
+            self._names[item_id] = name
+            for token in _tokens(name):
+                bisect.insort(self._entries, (token, item_id))
+
+    def remove(self, item_id: str) -> None:
+        """Drop an id from the index"""
+        with self._lock:
+            self._remove(item_id)
+
+    def search(self, prefix: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """(id, name) pairs whose name or one of its words starts with prefix, in token order"""
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            index = bisect.bisect_left(self._entries, (prefix, ""))
+            while index < len(self._entries) and len(results) < limit:
+                token, item_id = self._entries[index]
+                if not token.startswith(prefix):
+                    break
+                if item_id not in seen:
+                    seen.add(item_id)
+                    results.append((item_id, self._names[item_id]))
+                index += 1
+        return results
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _remove(self, item_id: str) -> None:
+        name = self._names.pop(item_id, None)
+        if name is None:
+            return
+        for token in _tokens(name):
+            index = bisect.bisect_left(self._entries, (token, item_id))
+            if index < len(self._entries) and self._entries[index] == (token, item_id):
+                del self._entries[index]
@@ -1,33 +1,23 @@
 from typing import List, Optional, Dict, Any
-from pymongo import MongoClient
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from services.mongo_client_registry import client_registry
 import datetime
-import certifi
+
+def _copy(projection: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """A per-call copy of a projection"""
+    # Services pass shared module-level projections and mongomock adds keys to the one it gets
+    return dict(projection) if projection is not None else None
 
 class BaseRepository:
     def __init__(self, connection_string: str, db_name: str, collection_name: str):
         try:
-            # Use certifi to provide up-to-date SSL certificates
-            ca = certifi.where()
-            
-            # Initialize MongoDB client with proper configuration for PyMongo 4.6.1
-            self.client = MongoClient(
-                connection_string, 
-                tlsCAFile=ca,
-                connectTimeoutMS=30000,
-                socketTimeoutMS=30000,
-                serverSelectionTimeoutMS=30000,
-                maxPoolSize=50,
-                minPoolSize=5,
-                retryWrites=True,
-                w="majority"
-            )
+            # All repositories with the same connection string share one client and its pool
+            self.client = client_registry.get_client(connection_string)
             
             self.db = self.client[db_name]
             self.collection = self.db[collection_name]
             
-            # Test the connection
-            self.client.admin.command('ping')
             print(f"✓ Successfully connected to {collection_name} collection")
             
         except Exception as e:
@@ -42,20 +32,59 @@ class BaseRepository:
         result = self.collection.insert_one(data)
         return str(result.inserted_id)
 
-    def find_by_id(self, id: str) -> Optional[Dict[str, Any]]:
+    def create_and_return(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new document and return it as stored, without reading it back"""
+        self.create(data)  # insert_one sets data["_id"]
+        
+        # Mirror what a read returns: BSON dates are naive UTC with millisecond precision
+        for key, value in data.items():
+            if isinstance(value, datetime.datetime):
+                if value.tzinfo is not None:
+                    value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+                data[key] = value.replace(microsecond=value.microsecond // 1000 * 1000)
+        return data
+
+    def create_many(self, documents: List[Dict[str, Any]]) -> List[str]:
+        """Create several documents with a single insert_many and return their IDs"""
+        if not documents:
+            return []
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for data in documents:
+            # Documents may come with a pre-assigned _id (e.g. buffered logs), they still get a created_at
+            data.setdefault("created_at", now)
+            data["updated_at"] = now
+        result = self.collection.insert_many(documents, ordered=False)
+        return [str(id) for id in result.inserted_ids]
+
+    def find_by_id(self, id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """Find a document by its ID"""
         try:
-            return self.collection.find_one({"_id": ObjectId(id)})
+            return self.collection.find_one({"_id": ObjectId(id)}, _copy(projection))
         except:
             return None
 
-    def find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def find_by_ids(self, ids: List[str], projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Find documents by a list of IDs with a single $in query, preserving the order of ids"""
+        object_ids = []
+        for id in ids:
+            try:
+                object_ids.append(ObjectId(id))
+            except Exception:
+                continue
+        if not object_ids:
+            return []
+        
+        documents = {str(doc["_id"]): doc for doc in self.collection.find({"_id": {"$in": object_ids}}, _copy(projection))}
+        return [documents[id] for id in ids if id in documents]
+
+    def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """Find one document matching the query"""
-        return self.collection.find_one(query)
+        return self.collection.find_one(query, _copy(projection))
 
-    def find_many(self, query: Dict[str, Any], sort_by: Optional[List] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def find_many(self, query: Dict[str, Any], sort_by: Optional[List] = None, limit: Optional[int] = None,
+                  projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Find multiple documents matching the query"""
-        cursor = self.collection.find(query)
+        cursor = self.collection.find(query, _copy(projection))
         if sort_by:
             cursor = cursor.sort(sort_by)
         if limit:
@@ -63,9 +92,10 @@ class BaseRepository:
         return list(cursor)
 
     def find_many_with_skip(self, query: Dict[str, Any], sort_by: Optional[List] = None, 
-                           limit: Optional[int] = None, skip: int = 0) -> List[Dict[str, Any]]:
+                           limit: Optional[int] = None, skip: int = 0,
+                           projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Find multiple documents matching the query with skip for pagination"""
-        cursor = self.collection.find(query)
+        cursor = self.collection.find(query, _copy(projection))
         if sort_by:
             cursor = cursor.sort(sort_by)
         if skip > 0:
@@ -83,17 +113,90 @@ class BaseRepository:
         )
         return result.modified_count > 0
 
+    def update_by_id_and_return(self, id: str, data: Dict[str, Any], query: Optional[Dict[str, Any]] = None,
+                                projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Update a document by its ID (and optional extra conditions) and return it as it is after the update"""
+        try:
+            filter = {"_id": ObjectId(id)}
+        except Exception:
+            return None
+        if query:
+            filter.update(query)
+        data["updated_at"] = datetime.datetime.now(datetime.timezone.utc)
+        return self.collection.find_one_and_update(
+            filter,
+            {"$set": data},
+            projection=_copy(projection),
+            return_document=ReturnDocument.AFTER
+        )
+
     def update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
         """Update one document matching the query"""
         update.setdefault("$set", {})["updated_at"] = datetime.datetime.now(datetime.timezone.utc)
         result = self.collection.update_one(query, update)
         return result.modified_count > 0
 
+    def update_many(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> int:
+        """Update all documents matching the query and return how many were modified"""
+        update.setdefault("$set", {})["updated_at"] = datetime.datetime.now(datetime.timezone.utc)
+        result = self.collection.update_many(query, update, upsert=upsert)
+        return result.modified_count
+
+    def bulk_update_by_ids(self, updates: Dict[str, Dict[str, Any]], newer_field: Optional[str] = None) -> int:
+        """Apply a $set per document ID with one unordered bulk write, return how many were modified"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        operations = []
+        for id, data in updates.items():
+            try:
+                query = {"_id": ObjectId(id)}
+            except Exception:
+                continue
+            if newer_field is not None:
+                # Only if the stored value is older or missing, so a late write from another process loses
+                query[newer_field] = {"$not": {"$gte": data[newer_field]}}
+            operations.append(UpdateOne(query, {"$set": dict(data, updated_at=now)}))
+        if not operations:
+            return 0
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    def upsert_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        """Update one document matching the query, inserting it if it does not exist"""
+        update.setdefault("$set", {})["updated_at"] = datetime.datetime.now(datetime.timezone.utc)
+        result = self.collection.update_one(query, update, upsert=True)
+        return result.modified_count > 0 or result.upserted_id is not None
+
+    def insert_if_absent(self, query: Dict[str, Any], fields: Dict[str, Any]) -> bool:
+        """Insert query + fields unless a document matches the query, return True if it was inserted"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        result = self.collection.update_one(
+            query,
+            {"$setOnInsert": dict(fields, created_at=now, updated_at=now)},
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    def delete_many(self, query: Dict[str, Any]) -> int:
+        """Delete all documents matching the query and return how many were deleted"""
+        result = self.collection.delete_many(query)
+        return result.deleted_count
+
     def delete_by_id(self, id: str) -> bool:
         """Delete a document by its ID"""
         result = self.collection.delete_one({"_id": ObjectId(id)})
         return result.deleted_count > 0
 
+    def delete_by_id_and_return(self, id: str, query: Optional[Dict[str, Any]] = None,
+                                projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Delete a document by its ID (and optional extra conditions) and return the deleted document"""
+        try:
+            filter = {"_id": ObjectId(id)}
+        except Exception:
+            return None
+        if query:
+            filter.update(query)
+        return self.collection.find_one_and_delete(filter, projection=_copy(projection))
+
     def add_to_array(self, id: str, field: str, value: Any) -> bool:
         """Add a value to an array field (using $addToSet to avoid duplicates)"""
         result = self.collection.update_one(
@@ -114,4 +217,8 @@ class BaseRepository:
         """Count documents matching the query"""
         if query is None:
             query = {}
-        return self.collection.count_documents(query) 
\ No newline at end of file
+        return self.collection.count_documents(query)
+
+    def estimated_count(self) -> int:
+        """Estimate the number of documents in the collection from its metadata"""
+        return self.collection.estimated_document_count() 
\ No newline at end of file
@@ -0,0 +1,124 @@
+from typing import Dict, List, Any, Callable, Optional, Tuple
+import abc
+import json
+import os
+import socket
+import threading
+import uuid
+
+Handler = Callable[[Dict[str, Any]], None]
+
+class BroadcastBus(abc.ABC):
+    """
+    Publish/subscribe channel between all workers of the deployment.
+
+    Every published message is delivered to the subscribers of every worker, including
+    the publishing one. Messages carry an "origin" key so handlers can tell local
+    messages apart with is_local().
+    """
+
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        """Register a handler for messages published on a channel"""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    @abc.abstractmethod
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        """Publish a JSON-serializable message on a channel"""
+        pass
+
+    def close(self) -> None:
+        """Stop receiving messages"""
+        pass
+
+    def is_local(self, message: Dict[str, Any]) -> bool:
+        """Check if a message was published by this process"""
+        return message.get("origin") == self.node_id
+
+    def _dispatch(self, channel: str, message: Dict[str, Any]) -> None:
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(message)
+            except Exception as e:
+                print(f"✗ Broadcast handler for '{channel}' failed: {e}")
+
+
+class InMemoryBroadcastBus(BroadcastBus):
+    """Bus for single-process deployments, delivers synchronously"""
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self._dispatch(channel, dict(message, origin=self.node_id))
+
+
+class RedisBroadcastBus(BroadcastBus):
+    """Bus backed by Redis PUBLISH/SUBSCRIBE, received on a background thread"""
+
+    def __init__(self, client: Any, prefix: str = "chat"):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        super().subscribe(channel, handler)
+        if self._pubsub is None:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self._channel(channel))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name="broadcast-bus", daemon=True)
+            self._thread.start()
+
+    def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self.client.publish(self._channel(channel), json.dumps(dict(message, origin=self.node_id)))
+
+    def close(self) -> None:
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def poll(self, timeout: float = 0.0) -> bool:
+        """Deliver at most one pending message, return True if one was handled"""
+        pubsub = self._pubsub
+        if pubsub is None:
+            return False
+        raw = pubsub.get_message(timeout=timeout)
+        if not raw or raw.get("type") != "message":
+            return False
+        channel, message = self._decode(raw)
+        self._dispatch(channel, message)
+        return True
+
+    def _listen(self) -> None:
+        while self._pubsub is not None:
+            try:
+                self.poll(timeout=1.0)
+            except Exception as e:
+                print(f"✗ Broadcast bus listener error: {e}")
+
+    def _channel(self, channel: str) -> str:
+        return f"{self.prefix}:bus:{channel}"
+
+    def _decode(self, raw: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        channel = raw["channel"]
+        data = raw["data"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        if isinstance(data, bytes):
+            data = data.decode()
+        return channel[len(self.prefix) + len(":bus:"):], json.loads(data)
+
+
+def create_realtime_backends(redis_url: Optional[str] = None, prefix: str = "chat"):
+    """Build the socket registry and broadcast bus, using Redis when a URL is configured"""
+    from services.socket_registry import InMemorySocketRegistry, RedisSocketRegistry
+
+    if not redis_url:
+        return InMemorySocketRegistry(), InMemoryBroadcastBus()
+
+    import redis  # Optional dependency, only needed for multi-worker deployments
+    client = redis.Redis.from_url(redis_url, decode_responses=True)
+    return RedisSocketRegistry(client, prefix), RedisBroadcastBus(client, prefix)
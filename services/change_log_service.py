@@ -0,0 +1,127 @@
+from typing import List, Dict, Any, Optional
+from services.base_repository import BaseRepository
+from services.json_provider import iso_or_now
+from pymongo import IndexModel, ASCENDING
+from bson import ObjectId
+import datetime
+
+MESSAGE_CREATED = "message_created"
+MESSAGE_EDITED = "message_edited"
+MESSAGE_DELETED = "message_deleted"
+MEMBER_JOINED = "member_joined"
+MEMBER_LEFT = "member_left"
+
+MEMBER_CHANGES = [MEMBER_JOINED, MEMBER_LEFT]
+
+class ChangeLogService:
+    """
+    Append-only log of group changes used by reconnecting clients to catch up.
+
+    Every change gets an ObjectId, so a client cursor is simply the id of the last change
+    it has seen. Entries expire after RETENTION_SECONDS through a TTL index; a cursor older
+    than that can no longer be served and the client has to reload its state.
+
+    The ids are generated by the workers, not by MongoDB, so they are only ordered across
+    workers as far as the worker clocks agree. Changes younger than settle_seconds are held
+    back; a change whose id is older than that when it becomes visible (a worker clock
+    behind by more, or an insert slower than that) can be skipped by a cursor that has
+    already moved past it. Keep the worker clocks NTP-synchronised and settle_seconds above
+    the clock skew plus the slowest expected insert.
+    """
+
+    RETENTION_SECONDS = 7 * 24 * 3600
+    # Default hold-back window for recent changes, see the class docstring
+    SETTLE_SECONDS = 2.0
+
+    INDEXES = [
+        # changes of a user's groups after a cursor
+        IndexModel([("group_id", ASCENDING), ("_id", ASCENDING)], name="group_id_id"),
+        # the user's own joins and leaves, including groups they are no longer in
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id",
+                   partialFilterExpression={"user_id": {"$type": "string"}}),
+        # retention window
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=RETENTION_SECONDS)
+    ]
+    # Created on every startup, without the TTL index the change log grows forever
+    REQUIRED_INDEXES = ["created_at_ttl"]
+
+    def __init__(self, repository: BaseRepository, settle_seconds: float = SETTLE_SECONDS):
+        self.repository = repository
+        self.settle_seconds = settle_seconds
+
+    def record(self, change_type: str, group_id: str, data: Dict[str, Any], user_id: Optional[str] = None) -> str:
+        """Append a change, return its id"""
+        change = {
+            "type": change_type,
+            "group_id": group_id,
+            "data": data
+        }
+        if user_id:
+            change["user_id"] = user_id
+        return self.repository.create(change)
+
+    def record_message(self, change_type: str, message: Dict[str, Any]) -> str:
+        """Append a message change; deletions only carry the message id"""
+        if change_type == MESSAGE_DELETED:
+            data = {"message_id": message["id"]}
+        else:
+            data = message
+        return self.record(change_type, message["group_id"], data)
+
+    def record_membership(self, group_id: str, user_id: str, joined: bool) -> str:
+        """Append a member joined/left change"""
+        return self.record(MEMBER_JOINED if joined else MEMBER_LEFT, group_id, {"user_id": user_id}, user_id)
+
+    def get_changes(self, user_id: str, group_ids: List[str], cursor: Optional[str] = None,
+                    limit: int = 500) -> Dict[str, Any]:
+        """Changes in the user's groups after the cursor, oldest first"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        upper = ObjectId.from_datetime(now - datetime.timedelta(seconds=self.settle_seconds))
+
+        after = self._parse_cursor(cursor)
+        oldest_servable = now - datetime.timedelta(seconds=self.RETENTION_SECONDS)
+        if after is None or after.generation_time < oldest_servable:
+            # Nothing to replay from: the client reloads its state and syncs from here on
+            return {"changes": [], "cursor": str(upper), "has_more": False, "reset": True}
+
+        if after >= upper:
+            return {"changes": [], "cursor": str(after), "has_more": False, "reset": False}
+
+        id_range = {"$gt": after, "$lte": upper}
+        changes = self.repository.find_many(
+            {"$or": [
+                {"group_id": {"$in": group_ids}, "_id": id_range},
+                {"user_id": user_id, "type": {"$in": MEMBER_CHANGES}, "_id": id_range}
+            ]},
+            sort_by=[("_id", 1)],
+            limit=limit + 1
+        )
+
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        # Without more changes the client can move straight to the upper bound
+        next_cursor = changes[-1]["_id"] if has_more else upper
+        return {
+            "changes": [self._to_dto(change) for change in changes],
+            "cursor": str(next_cursor),
+            "has_more": has_more,
+            "reset": False
+        }
+
+    def _parse_cursor(self, cursor: Optional[str]) -> Optional[ObjectId]:
+        if not cursor:
+            return None
+        try:
+            return ObjectId(cursor)
+        except Exception:
+            return None
+
+    def _to_dto(self, change: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert database change to DTO"""
+        return {
+            "id": str(change["_id"]),
+            "type": change["type"],
+            "group_id": change["group_id"],
+            "data": change.get("data", {}),
+            "created_at": iso_or_now(change.get("created_at"))
+        }
@@ -1,11 +1,48 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, FrozenSet
 from services.base_repository import BaseRepository
+from services.json_provider import iso_or_now
+from services.autocomplete import PrefixIndex
+from services.membership_cache import MembershipCache
+from services.typing_service import TypingStateStore
+from services.membership_store import MembershipStore, EmbeddedMembershipStore
+from pymongo import IndexModel, ASCENDING, DESCENDING
 import datetime
-from bson import ObjectId
+
+# Fields read by _to_dto
+GROUP_DTO_PROJECTION = {
+    "name": 1,
+    "description": 1,
+    "creator_id": 1,
+    "is_private": 1,
+    "members": 1,
+    "admins": 1,
+    "member_count": 1,
+    "last_activity": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
 
 class GroupService:
-    def __init__(self, repository: BaseRepository):
+    INDEXES = [
+        # get_user_groups, is_member
+        IndexModel([("members", ASCENDING), ("last_activity", DESCENDING)], name="members_last_activity"),
+        # get_public_groups, search_groups
+        IndexModel([("is_private", ASCENDING), ("last_activity", DESCENDING)], name="is_private_last_activity")
+    ]
+
+    # Groups larger than this are not loaded into the membership cache, is_member uses point queries
+    MAX_CACHED_MEMBERS = 10000
+
+    def __init__(self, repository: BaseRepository, membership_cache: Optional[MembershipCache] = None,
+                 membership_store: Optional[MembershipStore] = None, name_index: Optional[PrefixIndex] = None,
+                 typing_state: Optional[TypingStateStore] = None):
         self.repository = repository
+        self.membership_cache = membership_cache or MembershipCache()
+        self.membership_store = membership_store or EmbeddedMembershipStore(repository)
+        # Optional in-memory index of public group names used by suggest_groups
+        self.name_index = name_index
+        # Optional in-memory typing indicators shipped as typing_users
+        self.typing_state = typing_state
 
     def create_group(self, name: str, creator_id: str, description: str = "", is_private: bool = False) -> Dict[str, Any]:
         """Create a new group/chat room"""
@@ -14,47 +51,62 @@ class GroupService:
             "description": description,
             "creator_id": creator_id,
             "is_private": is_private,
-            "members": [creator_id],
-            "admins": [creator_id],
-            "typing_users": [],  # Users currently typing in this group
+            **self.membership_store.initial_group_fields(creator_id),
             "last_activity": datetime.datetime.now(datetime.timezone.utc)
         }
         
-        group_id = self.repository.create(group_data)
-        return self.get_group(group_id)
+        group = self.repository.create_and_return(group_data)
+        self.membership_store.group_created(str(group["_id"]), creator_id)
+        self.membership_cache.put(str(group["_id"]), [creator_id])
+        self._index_name(group)
+        return self._to_dto(group)
 
     def get_group(self, group_id: str) -> Optional[Dict[str, Any]]:
         """Get group details by ID"""
-        group = self.repository.find_by_id(group_id)
+        group = self.repository.find_by_id(group_id, GROUP_DTO_PROJECTION)
         return self._to_dto(group) if group else None
 
+    def get_groups(self, group_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get several groups with one query, in the order of group_ids (missing groups are skipped)"""
+        groups = self.repository.find_by_ids(group_ids, GROUP_DTO_PROJECTION)
+        return [self._to_dto(group) for group in groups]
+
     def get_user_groups(self, user_id: str) -> List[Dict[str, Any]]:
         """Get all groups where user is a member"""
         groups = self.repository.find_many(
-            {"members": user_id},
-            sort_by=[("last_activity", -1)]
+            self.membership_store.user_groups_filter(user_id),
+            sort_by=[("last_activity", -1)],
+            projection=GROUP_DTO_PROJECTION
         )
         return [self._to_dto(group) for group in groups]
 
+    def get_user_group_ids(self, user_id: str) -> List[str]:
+        """Get only the IDs of all groups where user is a member"""
+        return self.membership_store.get_user_group_ids(user_id)
+
     def get_public_groups(self, limit: int = 20) -> List[Dict[str, Any]]:
         """Get public groups that can be joined"""
         groups = self.repository.find_many(
             {"is_private": False},
             sort_by=[("last_activity", -1)],
-            limit=limit
+            limit=limit,
+            projection=GROUP_DTO_PROJECTION
         )
         return [self._to_dto(group) for group in groups]
 
     def add_member(self, group_id: str, user_id: str) -> bool:
         """Add a member to the group"""
-        return self.repository.add_to_array(group_id, "members", user_id)
+        success = self.membership_store.add_member(group_id, user_id)
+        if success:
+            self.membership_cache.add_member(group_id, user_id)
+        return success
 
     def remove_member(self, group_id: str, user_id: str) -> bool:
         """Remove a member from the group"""
-        # Remove from members and admins
-        success1 = self.repository.remove_from_array(group_id, "members", user_id)
-        success2 = self.repository.remove_from_array(group_id, "admins", user_id)
-        return success1
+        success = self.membership_store.remove_member(group_id, user_id)
+        if success:
+            self.membership_cache.remove_member(group_id, user_id)
+        return success
 
     def add_admin(self, group_id: str, user_id: str, requester_id: str) -> bool:
         """Add an admin to the group (only existing admins can do this)"""
@@ -65,11 +117,11 @@ class GroupService:
         if not self.is_member(group_id, user_id):
             return False
             
-        return self.repository.add_to_array(group_id, "admins", user_id)
+        return self.membership_store.add_admin(group_id, user_id)
 
     def remove_admin(self, group_id: str, user_id: str, requester_id: str) -> bool:
         """Remove an admin from the group"""
-        group = self.repository.find_by_id(group_id)
+        group = self.repository.find_by_id(group_id, {"creator_id": 1})
         if not group:
             return False
             
@@ -81,44 +133,50 @@ class GroupService:
         if not self.is_admin(group_id, requester_id):
             return False
             
-        return self.repository.remove_from_array(group_id, "admins", user_id)
+        return self.membership_store.remove_admin(group_id, user_id)
 
-    def update_group(self, group_id: str, data: Dict[str, Any], requester_id: str) -> bool:
-        """Update group details (only admins can do this)"""
-        if not self.is_admin(group_id, requester_id):
-            return False
-            
+    def update_group(self, group_id: str, data: Dict[str, Any], requester_id: str) -> Optional[Dict[str, Any]]:
+        """Update group details (only admins can do this) and return the updated group"""
         allowed_fields = ["name", "description", "is_private"]
         update_data = {k: v for k, v in data.items() if k in allowed_fields}
         
         if not update_data:
-            return False
-            
-        return self.repository.update_by_id(group_id, update_data)
+            return None
+        
+        admin_filter = self.membership_store.admin_filter(group_id, requester_id)
+        if admin_filter is None:
+            return None
+
+        group = self.repository.update_by_id_and_return(group_id, update_data, query=admin_filter)
+        if not group:
+            return None
+        self._index_name(group)
+        return self._to_dto(group)
 
     def delete_group(self, group_id: str, requester_id: str) -> bool:
         """Delete a group (only creator can do this)"""
-        group = self.repository.find_by_id(group_id)
+        group = self.repository.find_by_id(group_id, {"creator_id": 1})
         if not group or group.get("creator_id") != requester_id:
             return False
             
-        return self.repository.delete_by_id(group_id)
+        self.membership_cache.invalidate(group_id)
+        success = self.repository.delete_by_id(group_id)
+        if success:
+            self.membership_store.group_deleted(group_id)
+            if self.name_index is not None:
+                self.name_index.remove(group_id)
+        return success
 
     def is_member(self, group_id: str, user_id: str) -> bool:
         """Check if user is a member of the group"""
-        try:
-            group = self.repository.find_one({"_id": ObjectId(group_id), "members": user_id})
-            return bool(group)
-        except Exception:
-            return False
+        members = self._get_member_set(group_id)
+        if members is not None:
+            return user_id in members
+        return self.membership_store.is_member(group_id, user_id)
 
     def is_admin(self, group_id: str, user_id: str) -> bool:
         """Check if user is an admin of the group"""
-        try:
-            group = self.repository.find_one({"_id": ObjectId(group_id), "admins": user_id})
-            return bool(group)
-        except Exception:
-            return False
+        return self.membership_store.is_admin(group_id, user_id)
 
     def update_last_activity(self, group_id: str) -> bool:
         """Update the last activity timestamp for the group"""
@@ -126,51 +184,95 @@ class GroupService:
             "last_activity": datetime.datetime.now(datetime.timezone.utc)
         })
 
-    def set_user_typing(self, group_id: str, user_id: str, is_typing: bool) -> bool:
-        """Set user typing status in the group"""
-        if is_typing:
-            return self.repository.add_to_array(group_id, "typing_users", user_id)
-        else:
-            return self.repository.remove_from_array(group_id, "typing_users", user_id)
-
-    def get_typing_users(self, group_id: str) -> List[str]:
-        """Get list of users currently typing in the group"""
-        group = self.repository.find_by_id(group_id)
-        return group.get("typing_users", []) if group else []
-
     def search_groups(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search public groups by name"""
+        """Search public groups by name (substring match, see suggest_groups for prefix autocomplete)"""
         groups = self.repository.find_many(
             {
                 "name": {"$regex": query, "$options": "i"},
                 "is_private": False
             },
             sort_by=[("last_activity", -1)],
-            limit=limit
+            limit=limit,
+            projection=GROUP_DTO_PROJECTION
         )
         return [self._to_dto(group) for group in groups]
 
     def get_group_members(self, group_id: str) -> List[str]:
         """Get list of group member IDs"""
-        group = self.repository.find_by_id(group_id)
-        return group.get("members", []) if group else []
+        members = self._get_member_set(group_id)
+        if members is not None:
+            return list(members)
+        return self.membership_store.get_member_ids(group_id)
+
+    def list_members(self, group_id: str, limit: int = 50, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get a page of group members ordered by user ID, starting after the given user ID"""
+        return self.membership_store.list_members(group_id, limit, after)
+
+    def suggest_groups(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Autocomplete public group names from the in-memory index without a database read"""
+        if self.name_index is None:
+            return []
+        return [{"id": group_id, "name": name} for group_id, name in self.name_index.search(prefix, limit)]
+
+    def load_name_index(self) -> int:
+        """Fill the public group name index from the database, return the number of groups"""
+        if self.name_index is None:
+            self.name_index = PrefixIndex()
+        groups = self.repository.find_many({"is_private": False}, projection={"name": 1})
+        return self.name_index.load((str(group["_id"]), group.get("name", "")) for group in groups)
+
+    def get_membership_cache_stats(self) -> Dict[str, Any]:
+        """Get hit-rate counters of the membership cache"""
+        return self.membership_cache.stats()
+
+    def _index_name(self, group: Dict[str, Any]) -> None:
+        """Keep the name index in line with a created or updated group"""
+        if self.name_index is None:
+            return
+        if group.get("is_private", False):
+            self.name_index.remove(str(group["_id"]))
+        else:
+            self.name_index.add(str(group["_id"]), group["name"])
+
+    def _get_member_set(self, group_id: str) -> Optional[FrozenSet[str]]:
+        """Get the member set of a group, loading it into the cache on a miss (None if missing or too large)"""
+        members = self.membership_cache.get(group_id)
+        if members is None:
+            token = self.membership_cache.begin_fill(group_id)
+            try:
+                members = self.membership_store.load_member_set(group_id, self.MAX_CACHED_MEMBERS)
+            except Exception:
+                self.membership_cache.cancel_fill(group_id, token)
+                raise
+            if members is None:
+                self.membership_cache.cancel_fill(group_id, token)
+                return None
+            if not self.membership_cache.put(group_id, members, token):
+                # Membership changed during the load, the snapshot may be missing that change
+                return None
+        return members
 
     def _to_dto(self, group: Dict[str, Any]) -> Dict[str, Any]:
         """Convert database group to DTO"""
         if not group:
             return None
             
-        return {
+        dto = {
             "id": str(group["_id"]),
             "name": group["name"],
             "description": group.get("description", ""),
             "creator_id": group["creator_id"],
             "is_private": group.get("is_private", False),
-            "members": group.get("members", []),
-            "admins": group.get("admins", []),
-            "member_count": len(group.get("members", [])),
-            "typing_users": group.get("typing_users", []),
-            "last_activity": group.get("last_activity", datetime.datetime.now(datetime.timezone.utc)).isoformat(),
-            "created_at": group.get("created_at", datetime.datetime.now(datetime.timezone.utc)).isoformat(),
-            "updated_at": group.get("updated_at", datetime.datetime.now(datetime.timezone.utc)).isoformat()
-        } 
\ No newline at end of file
+            "member_count": group.get("member_count", len(group.get("members", []))),
+            # Typing indicators live in memory only; a persisted typing_users array is ignored
+            "typing_users": self.typing_state.get_typing_users(str(group["_id"])) if self.typing_state else [],
+            "last_activity": iso_or_now(group.get("last_activity")),
+            "created_at": iso_or_now(group.get("created_at")),
+            "updated_at": iso_or_now(group.get("updated_at"))
+        }
+
+        # Embedded membership still ships the arrays; separate membership storage only has member_count
+        if "members" in group:
+            dto["members"] = group["members"]
+            dto["admins"] = group.get("admins", [])
+        return dto
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+Index bootstrap for the collections used by the services.
+
+Every service declares the indexes its queries rely on in an INDEXES class attribute.
+ensure_indexes() creates the missing ones (create_index is idempotent for identical
+specs) and reports indexes that exist in the database but are undeclared or have not
+been used since the server started.
+
+Indexes listed in a service's REQUIRED_INDEXES are needed for correctness (uniqueness,
+$text search, TTL retention) rather than speed; the server creates them on every startup,
+the others only with ENSURE_INDEXES_ON_STARTUP or this command.
+
+Usage:
+python -m services.index_manager          -- create missing indexes and print the report
+python -m services.index_manager --check  -- only print the report
+"""
+
+from typing import List, Dict, Any, Tuple
+from pymongo import IndexModel
+from services.base_repository import BaseRepository
+import json
+import sys
+
+def _declared_name(index: IndexModel) -> str:
+    return index.document["name"]
+
+def required_indexes(service: Any) -> List[IndexModel]:
+    """The declared indexes of a service that are listed in its REQUIRED_INDEXES"""
+    names = set(getattr(service, "REQUIRED_INDEXES", []))
+    return [index for index in service.INDEXES if _declared_name(index) in names]
+
+class IndexManager:
+    def __init__(self, targets: List[Tuple[BaseRepository, List[IndexModel]]]):
+        self.targets = targets
+
+    def ensure_indexes(self, create: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Create missing declared indexes and report on every target collection"""
+        report = {}
+        for repository, indexes in self.targets:
+            report[repository.collection.name] = self._ensure_collection(repository, indexes, create)
+        return report
+
+    def _ensure_collection(self, repository: BaseRepository, indexes: List[IndexModel], create: bool) -> Dict[str, Any]:
+        collection = repository.collection
+        existing = set(collection.index_information().keys())
+        declared = [_declared_name(index) for index in indexes]
+
+        result = {
+            "missing": [name for name in declared if name not in existing],
+            "created": [],
+            "failed": {},
+            "undeclared": sorted(existing - set(declared) - {"_id_"}),
+            "unused": self._unused_indexes(repository)
+        }
+
+        if create:
+            for index in indexes:
+                name = _declared_name(index)
+                if name not in result["missing"]:
+                    continue
+                try:
+                    collection.create_indexes([index])
+                    result["created"].append(name)
+                except Exception as e:
+                    result["failed"][name] = str(e)
+        return result
+
+    def _unused_indexes(self, repository: BaseRepository):
+        """Indexes without any access since the mongod process started, None if unknown"""
+        try:
+            stats = repository.collection.aggregate([{"$indexStats": {}}])
+            return sorted(s["name"] for s in stats if s["name"] != "_id_" and s["accesses"]["ops"] == 0)
+        except Exception:
+            return None
+
+
+def build_targets(connection_string: str, db_name: str) -> List[Tuple[BaseRepository, List[IndexModel]]]:
+    """Repositories and declared indexes for every service collection"""
+    from services.user_service import UserService
+    from services.group_service import GroupService
+    from services.message_service import MessageService
+    from services.log_service import LogService
+    from services.unread_service import UnreadCounterService
+    from services.membership_store import CollectionMembershipStore
+    from services.change_log_service import ChangeLogService
+    import settings
+
+    collections = [
+        ("users", UserService),
+        ("groups", GroupService),
+        ("messages", MessageService),
+        ("logs", LogService),
+        ("unread_counters", UnreadCounterService),
+        ("changes", ChangeLogService)
+    ]
+    if getattr(settings, "GROUP_MEMBERSHIP_STORAGE", "embedded") == "collection":
+        collections.append(("group_members", CollectionMembershipStore))
+    return [(BaseRepository(connection_string, db_name, name), service.INDEXES) for name, service in collections]
+
+
+def main(argv: List[str]) -> int:
+    import settings
+
+    create = "--check" not in argv
+    report = IndexManager(build_targets(settings.DB_CONNECTION_STRING, settings.DB_NAME)).ensure_indexes(create)
+    print(json.dumps(report, indent=2))
+    return 1 if any(r["failed"] for r in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
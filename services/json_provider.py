@@ -0,0 +1,103 @@
+"""
+JSON encoding for REST responses and Socket.IO packets.
+
+OrjsonProvider replaces Flask's stdlib based provider when orjson is installed
+(`pip install orjson`); otherwise StdlibJSONProvider is used. Both encode datetime
+as ISO 8601 and ObjectId as its hex string, so responses look the same either way.
+"""
+
+from typing import Any
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from bson import ObjectId
+import datetime
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Encode the non-JSON types that appear in documents and DTOs"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's default provider with ISO datetimes and ObjectId support"""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self._encode(obj, kwargs).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args["indent"] = 2
+
+        # orjson produces bytes, which the response can use without decoding
+        return self._app.response_class(self._encode(obj, dump_args) + b"\n", mimetype=self.mimetype)
+
+    def _encode(self, obj: Any, kwargs: dict) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.pop("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.pop("indent", None):
+            option |= orjson.OPT_INDENT_2
+        # Separators and ensure_ascii have no orjson equivalent; output is always compact UTF-8
+        kwargs.pop("separators", None)
+        kwargs.pop("ensure_ascii", None)
+        if kwargs:
+            return json.dumps(obj, default=_default, **kwargs).encode()
+        return orjson.dumps(obj, default=_default, option=option)
+
+
+class SocketJSON:
+    """json-module replacement for python-socketio packets"""
+
+    @staticmethod
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+        kwargs.setdefault("default", _default)
+        return json.dumps(obj, **kwargs)
+
+    @staticmethod
+    def loads(s, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+
+def install_json_provider(app: Flask, use_orjson: bool = True) -> str:
+    """Set the app's JSON provider, return the name of the encoder in use"""
+    if use_orjson and orjson is not None:
+        app.json = OrjsonProvider(app)
+        return "orjson"
+    app.json = StdlibJSONProvider(app)
+    return "json"
+
+
+def iso_or_now(value: Any) -> str:
+    """ISO string of a stored timestamp; the current time is only computed when it is missing"""
+    if value is not None:
+        return value.isoformat()
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
\ No newline at end of file
@@ -1,10 +1,159 @@
 from typing import List, Dict, Any, Optional
 from services.base_repository import BaseRepository
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
+import atexit
+import base64
 import datetime
+import queue
+import threading
+import time
+
+_STOP = object()
+
+# Fields read by LogService._to_dto
+LOG_DTO_PROJECTION = {
+    "timestamp": 1,
+    "level": 1,
+    "message": 1,
+    "url": 1,
+    "extra_data": 1
+}
+
+class BufferedLogWriter:
+    """
+    Writes log documents from a bounded queue on a background thread using insert_many.
+
+    A batch is flushed once it holds flush_size documents or flush_interval seconds after
+    its first document arrived. When the queue is full, submit() drops the document
+    (overflow="drop") or waits for free space (overflow="block"). Pending documents are
+    flushed by close(), which is also registered to run at interpreter exit.
+    """
+
+    def __init__(self, repository: BaseRepository, flush_size: int = 100, flush_interval: float = 1.0,
+                 max_queue_size: int = 10000, overflow: str = "drop"):
+        if overflow not in ("drop", "block"):
+            raise ValueError("overflow must be 'drop' or 'block'")
+        
+        self.repository = repository
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, document: Dict[str, Any]) -> bool:
+        """Queue a document for writing, return False if it was dropped"""
+        if self._closed:
+            # Late writes during shutdown go straight to the database; create_many also stamps
+            # created_at on documents that already carry an _id
+            self.repository.create_many([document])
+            self.written += 1
+            return True
+        
+        try:
+            self._queue.put(document, block=self.overflow == "block")
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self) -> None:
+        """Block until every queued document has been written"""
+        self._queue.join()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush pending documents and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring the writer"""
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flush_size": self.flush_size,
+            "flush_interval": self.flush_interval,
+            "overflow": self.overflow
+        }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            taken = 1
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+            
+            deadline = time.monotonic() + self.flush_interval
+            while not stopping and len(batch) < self.flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            
+            # Drain whatever is left when shutting down
+            while stopping:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is not _STOP:
+                    batch.append(item)
+            
+            self._write(batch)
+            for _ in range(taken):
+                self._queue.task_done()
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(batch), self.flush_size):
+            chunk = batch[start:start + self.flush_size]
+            try:
+                self.repository.create_many(chunk)
+                self.written += len(chunk)
+            except Exception as e:
+                self.failed += len(chunk)
+                print(f"✗ Failed to write {len(chunk)} log entries: {e}")
+
 
 class LogService:
-    def __init__(self, repository: BaseRepository):
+    INDEXES = [
+        # get_logs / get_logs_page without a level filter, (timestamp, _id) is the keyset
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_id"),
+        # get_logs / get_logs_page filtered by level
+        IndexModel([("level", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="level_timestamp_id")
+    ]
+
+    # Seconds a filtered count is reused before it is recomputed
+    COUNT_CACHE_TTL = 30.0
+
+    def __init__(self, repository: BaseRepository, writer: Optional[BufferedLogWriter] = None):
         self.repository = repository
+        self.writer = writer
+        self._count_cache: Dict[str, Any] = {}
 
     def create_log(self, message: str, url: str, level: str = "INFO", extra_data: Optional[Dict[str, Any]] = None) -> str:
         """Create a new log entry"""
@@ -15,6 +164,11 @@ class LogService:
             "url": url,
             "extra_data": extra_data or {}
         }
+        if self.writer:
+            # Assign the ID up front so callers get it without waiting for the write
+            log_data["_id"] = ObjectId()
+            self.writer.submit(log_data)
+            return str(log_data["_id"])
         return self.repository.create(log_data)
 
     def get_logs(self, limit: int = 100, level: Optional[str] = None, before: Optional[datetime.datetime] = None, 
@@ -27,15 +181,16 @@ class LogService:
         if before:
             query["timestamp"] = {"$lt": before}
         
-        # Get total count for pagination info
-        total_count = self.repository.count(query)
+        # Get total count for pagination info (cached, so paging through the same filter counts once)
+        total_count = self._cached_count(query)
         
         # Get the logs with pagination
         logs = self.repository.find_many_with_skip(
             query,
-            sort_by=[("timestamp", -1)],
+            sort_by=[("timestamp", -1), ("_id", -1)],
             limit=limit,
-            skip=skip
+            skip=skip,
+            projection=LOG_DTO_PROJECTION
         )
         
         return {
@@ -48,6 +203,80 @@ class LogService:
             }
         }
 
+    def get_logs_page(self, limit: int = 100, level: Optional[str] = None, cursor: Optional[str] = None,
+                      include_total: bool = False) -> Dict[str, Any]:
+        """Get logs with keyset pagination: the cursor seeks directly past the last returned (timestamp, _id)"""
+        query = {}
+        if level:
+            query["level"] = level.upper()
+        
+        if cursor:
+            timestamp, log_id = self.decode_cursor(cursor)
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": log_id}}
+            ]
+        
+        # Fetch one extra document to know whether another page exists
+        logs = self.repository.find_many(
+            query,
+            sort_by=[("timestamp", -1), ("_id", -1)],
+            limit=limit + 1,
+            projection=LOG_DTO_PROJECTION
+        )
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+        
+        pagination = {
+            "limit": limit,
+            "cursor": cursor,
+            "next_cursor": self.encode_cursor(logs[-1]) if has_more else None,
+            "has_more": has_more
+        }
+        if include_total:
+            pagination["total"] = self.count_logs(level)
+            pagination["total_estimated"] = not level
+        
+        return {
+            "logs": [self._to_dto(log) for log in logs],
+            "pagination": pagination
+        }
+
+    def count_logs(self, level: Optional[str] = None) -> int:
+        """Count logs cheaply: collection metadata without a filter, a cached count with one"""
+        if not level:
+            return self.repository.estimated_count()
+        return self._cached_count({"level": level.upper()})
+
+    @staticmethod
+    def encode_cursor(log: Dict[str, Any]) -> str:
+        """Build an opaque cursor pointing just after a log"""
+        raw = f"{log['timestamp'].isoformat()}|{log['_id']}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """Decode a cursor into (timestamp, ObjectId), raise ValueError if it is malformed"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            timestamp, log_id = raw.split("|")
+            return datetime.datetime.fromisoformat(timestamp), ObjectId(log_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    def _cached_count(self, query: Dict[str, Any]) -> int:
+        key = repr(sorted(query.items()))
+        now = time.monotonic()
+        cached = self._count_cache.get(key)
+        if cached and now - cached[1] < self.COUNT_CACHE_TTL:
+            return cached[0]
+        
+        count = self.repository.count(query)
+        if len(self._count_cache) > 100:
+            self._count_cache.clear()
+        self._count_cache[key] = (count, now)
+        return count
+
     def get_logs_simple(self, limit: int = 100, level: Optional[str] = None, before: Optional[datetime.datetime] = None) -> List[Dict[str, Any]]:
         """Get logs with simple pagination (backward compatibility)"""
         query = {}
@@ -60,7 +289,8 @@ class LogService:
         logs = self.repository.find_many(
             query,
             sort_by=[("timestamp", -1)],
-            limit=limit
+            limit=limit,
+            projection=LOG_DTO_PROJECTION
         )
         return [self._to_dto(log) for log in logs]
 
@@ -0,0 +1,111 @@
+from typing import Dict, Any, List, Optional, Iterable, FrozenSet
+from collections import OrderedDict
+import threading
+
+class MembershipCache:
+    """
+    Bounded LRU cache of group_id -> set of member ids.
+
+    A miss is filled from a load that started with begin_fill(); a membership change of the
+    group while the load runs makes the loaded snapshot stale and put() discards it.
+    """
+
+    def __init__(self, max_groups: int = 10000):
+        self.max_groups = max_groups
+        self._entries: "OrderedDict[str, FrozenSet[str]]" = OrderedDict()
+        self._fills: Dict[str, List[List[bool]]] = {}  # group_id -> stale flags of loads in progress
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, group_id: str) -> Optional[FrozenSet[str]]:
+        """Return the cached member set of a group, or None on a miss"""
+        with self._lock:
+            members = self._entries.get(group_id)
+            if members is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(group_id)
+            self.hits += 1
+            return members
+
+    def begin_fill(self, group_id: str) -> List[bool]:
+        """Register a load of a group's members; membership changes during the load make it stale"""
+        token = [False]
+        with self._lock:
+            self._fills.setdefault(group_id, []).append(token)
+        return token
+
+    def put(self, group_id: str, members: Iterable[str], token: Optional[List[bool]] = None) -> bool:
+        """Store the full member set of a group (loaded after begin_fill), return False if it was stale"""
+        with self._lock:
+            if token is not None:
+                self._release(group_id, token)
+                if token[0]:
+                    return False
+            self._entries[group_id] = frozenset(members)
+            self._entries.move_to_end(group_id)
+            while len(self._entries) > self.max_groups:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def cancel_fill(self, group_id: str, token: List[bool]) -> None:
+        """Forget a load that will not be stored"""
+        with self._lock:
+            self._release(group_id, token)
+
+    def add_member(self, group_id: str, user_id: str) -> None:
+        """Write-through a new member if the group is cached"""
+        with self._lock:
+            self._mark_stale(group_id)
+            members = self._entries.get(group_id)
+            if members is not None and user_id not in members:
+                self._entries[group_id] = members | {user_id}
+
+    def remove_member(self, group_id: str, user_id: str) -> None:
+        """Write-through a removed member if the group is cached"""
+        with self._lock:
+            self._mark_stale(group_id)
+            members = self._entries.get(group_id)
+            if members is not None and user_id in members:
+                self._entries[group_id] = members - {user_id}
+
+    def invalidate(self, group_id: str) -> None:
+        """Drop a group from the cache"""
+        with self._lock:
+            self._mark_stale(group_id)
+            self._entries.pop(group_id, None)
+
+    def clear(self) -> None:
+        """Drop all cached groups"""
+        with self._lock:
+            for group_id in list(self._fills):
+                self._mark_stale(group_id)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_groups": self.max_groups,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _mark_stale(self, group_id: str) -> None:
+        for token in self._fills.get(group_id, []):
+            token[0] = True
+
+    def _release(self, group_id: str, token: List[bool]) -> None:
+        # Tokens are compared by identity, equal flags of concurrent loads are different tokens
+        fills = [fill for fill in self._fills.get(group_id, []) if fill is not token]
+        if fills:
+            self._fills[group_id] = fills
+        else:
+            self._fills.pop(group_id, None)
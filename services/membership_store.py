@@ -0,0 +1,331 @@
+from typing import List, Dict, Any, Optional, FrozenSet
+from services.base_repository import BaseRepository
+from pymongo import IndexModel, ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+import abc
+import datetime
+import sys
+
+class MembershipStore(abc.ABC):
+    """
+    Storage of group membership used by GroupService.
+
+    EmbeddedMembershipStore keeps members/admins arrays inside the group document.
+    CollectionMembershipStore keeps one (group_id, user_id, role, joined_at) document per
+    membership and only a member_count on the group, so group documents stay constant-size.
+    """
+
+    INDEXES: List[IndexModel] = []
+    # Indexes created on every startup because correctness depends on them
+    REQUIRED_INDEXES: List[str] = []
+
+    @abc.abstractmethod
+    def initial_group_fields(self, creator_id: str) -> Dict[str, Any]:
+        """Membership fields stored in a new group document"""
+        pass
+
+    def group_created(self, group_id: str, creator_id: str) -> None:
+        """Hook called after a group document has been inserted"""
+        pass
+
+    @abc.abstractmethod
+    def add_member(self, group_id: str, user_id: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def remove_member(self, group_id: str, user_id: str) -> bool:
+        """Remove a member (and their admin role)"""
+        pass
+
+    @abc.abstractmethod
+    def add_admin(self, group_id: str, user_id: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def remove_admin(self, group_id: str, user_id: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def is_member(self, group_id: str, user_id: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def is_admin(self, group_id: str, user_id: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def load_member_set(self, group_id: str, max_members: int) -> Optional[FrozenSet[str]]:
+        """All member IDs of a group, None if the group is missing or larger than max_members"""
+        pass
+
+    @abc.abstractmethod
+    def get_member_ids(self, group_id: str) -> List[str]:
+        pass
+
+    @abc.abstractmethod
+    def list_members(self, group_id: str, limit: int = 50, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Page through members ordered by user ID, starting after the given user ID"""
+        pass
+
+    @abc.abstractmethod
+    def get_user_group_ids(self, user_id: str) -> List[str]:
+        pass
+
+    @abc.abstractmethod
+    def user_groups_filter(self, user_id: str) -> Dict[str, Any]:
+        """Query on the groups collection matching the groups of a user"""
+        pass
+
+    @abc.abstractmethod
+    def admin_filter(self, group_id: str, requester_id: str) -> Optional[Dict[str, Any]]:
+        """Extra update filter restricting a group write to admins, None if requester is not an admin"""
+        pass
+
+    def group_deleted(self, group_id: str) -> None:
+        """Hook called after a group document has been deleted"""
+        pass
+
+
+class EmbeddedMembershipStore(MembershipStore):
+    """Members and admins stored as arrays in the group document"""
+
+    def __init__(self, group_repository: BaseRepository):
+        self.group_repository = group_repository
+
+    def initial_group_fields(self, creator_id: str) -> Dict[str, Any]:
+        return {"members": [creator_id], "admins": [creator_id]}
+
+    def add_member(self, group_id: str, user_id: str) -> bool:
+        return self.group_repository.add_to_array(group_id, "members", user_id)
+
+    def remove_member(self, group_id: str, user_id: str) -> bool:
+        # Remove from members and admins
+        success1 = self.group_repository.remove_from_array(group_id, "members", user_id)
+        success2 = self.group_repository.remove_from_array(group_id, "admins", user_id)
+        return success1
+
+    def add_admin(self, group_id: str, user_id: str) -> bool:
+        return self.group_repository.add_to_array(group_id, "admins", user_id)
+
+    def remove_admin(self, group_id: str, user_id: str) -> bool:
+        return self.group_repository.remove_from_array(group_id, "admins", user_id)
+
+    def is_member(self, group_id: str, user_id: str) -> bool:
+        return self._has_role(group_id, "members", user_id)
+
+    def is_admin(self, group_id: str, user_id: str) -> bool:
+        return self._has_role(group_id, "admins", user_id)
+
+    def load_member_set(self, group_id: str, max_members: int) -> Optional[FrozenSet[str]]:
+        # The whole array is in the document anyway, so there is no point in a size limit
+        group = self.group_repository.find_by_id(group_id, {"members": 1})
+        return frozenset(group.get("members", [])) if group else None
+
+    def get_member_ids(self, group_id: str) -> List[str]:
+        group = self.group_repository.find_by_id(group_id, {"members": 1})
+        return group.get("members", []) if group else []
+
+    def list_members(self, group_id: str, limit: int = 50, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        group = self.group_repository.find_by_id(group_id, {"members": 1, "admins": 1})
+        if not group:
+            return []
+        admins = set(group.get("admins", []))
+        member_ids = sorted(m for m in group.get("members", []) if after is None or m > after)[:limit]
+        return [
+            {"user_id": m, "role": "admin" if m in admins else "member", "joined_at": None}
+            for m in member_ids
+        ]
+
+    def get_user_group_ids(self, user_id: str) -> List[str]:
+        groups = self.group_repository.find_many({"members": user_id}, projection={"_id": 1})
+        return [str(group["_id"]) for group in groups]
+
+    def user_groups_filter(self, user_id: str) -> Dict[str, Any]:
+        return {"members": user_id}
+
+    def admin_filter(self, group_id: str, requester_id: str) -> Optional[Dict[str, Any]]:
+        # Checked by the update itself, which keeps it a single round trip
+        return {"admins": requester_id}
+
+    def _has_role(self, group_id: str, field: str, user_id: str) -> bool:
+        try:
+            group = self.group_repository.find_one({"_id": ObjectId(group_id), field: user_id}, {"_id": 1})
+            return bool(group)
+        except Exception:
+            return False
+
+
+class CollectionMembershipStore(MembershipStore):
+    """One document per membership in a dedicated collection, group documents only keep member_count"""
+
+    INDEXES = [
+        # is_member / is_admin point lookups, uniqueness, list_members keyset on user_id
+        IndexModel([("group_id", ASCENDING), ("user_id", ASCENDING)], name="group_id_user_id", unique=True),
+        # get_user_group_ids
+        IndexModel([("user_id", ASCENDING), ("group_id", ASCENDING)], name="user_id_group_id")
+    ]
+    REQUIRED_INDEXES = ["group_id_user_id"]
+
+    def __init__(self, repository: BaseRepository, group_repository: BaseRepository):
+        self.repository = repository
+        self.group_repository = group_repository
+
+    def initial_group_fields(self, creator_id: str) -> Dict[str, Any]:
+        return {"member_count": 1}
+
+    def group_created(self, group_id: str, creator_id: str) -> None:
+        self._insert(group_id, creator_id, "admin")
+
+    def add_member(self, group_id: str, user_id: str) -> bool:
+        if not self._insert(group_id, user_id, "member"):
+            return False
+
+        # Count the member on the group; if the group does not exist undo the membership
+        if not self._inc_member_count(group_id, 1):
+            self.repository.delete_many({"group_id": group_id, "user_id": user_id})
+            return False
+        return True
+
+    def remove_member(self, group_id: str, user_id: str) -> bool:
+        if self.repository.delete_many({"group_id": group_id, "user_id": user_id}) == 0:
+            return False
+        self._inc_member_count(group_id, -1)
+        return True
+
+    def add_admin(self, group_id: str, user_id: str) -> bool:
+        return self.repository.update_one(
+            {"group_id": group_id, "user_id": user_id, "role": {"$ne": "admin"}},
+            {"$set": {"role": "admin"}}
+        )
+
+    def remove_admin(self, group_id: str, user_id: str) -> bool:
+        return self.repository.update_one(
+            {"group_id": group_id, "user_id": user_id, "role": "admin"},
+            {"$set": {"role": "member"}}
+        )
+
+    def is_member(self, group_id: str, user_id: str) -> bool:
+        return bool(self.repository.find_one({"group_id": group_id, "user_id": user_id}, {"_id": 1}))
+
+    def is_admin(self, group_id: str, user_id: str) -> bool:
+        return bool(self.repository.find_one({"group_id": group_id, "user_id": user_id, "role": "admin"}, {"_id": 1}))
+
+    def load_member_set(self, group_id: str, max_members: int) -> Optional[FrozenSet[str]]:
+        group = self.group_repository.find_by_id(group_id, {"member_count": 1})
+        if not group or group.get("member_count", 0) > max_members:
+            return None
+        return frozenset(self.get_member_ids(group_id))
+
+    def get_member_ids(self, group_id: str) -> List[str]:
+        rows = self.repository.find_many({"group_id": group_id}, projection={"_id": 0, "user_id": 1})
+        return [row["user_id"] for row in rows]
+
+    def list_members(self, group_id: str, limit: int = 50, after: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = {"group_id": group_id}
+        if after:
+            query["user_id"] = {"$gt": after}
+        rows = self.repository.find_many(
+            query,
+            sort_by=[("user_id", 1)],
+            limit=limit,
+            projection={"_id": 0, "user_id": 1, "role": 1, "joined_at": 1}
+        )
+        return [
+            {
+                "user_id": row["user_id"],
+                "role": row.get("role", "member"),
+                "joined_at": row["joined_at"].isoformat() if row.get("joined_at") else None
+            }
+            for row in rows
+        ]
+
+    def get_user_group_ids(self, user_id: str) -> List[str]:
+        rows = self.repository.find_many({"user_id": user_id}, projection={"_id": 0, "group_id": 1})
+        return [row["group_id"] for row in rows]
+
+    def user_groups_filter(self, user_id: str) -> Dict[str, Any]:
+        object_ids = []
+        for group_id in self.get_user_group_ids(user_id):
+            try:
+                object_ids.append(ObjectId(group_id))
+            except Exception:
+                continue
+        return {"_id": {"$in": object_ids}}
+
+    def admin_filter(self, group_id: str, requester_id: str) -> Optional[Dict[str, Any]]:
+        return {} if self.is_admin(group_id, requester_id) else None
+
+    def group_deleted(self, group_id: str) -> None:
+        self.repository.delete_many({"group_id": group_id})
+
+    def migrate_from_embedded(self) -> int:
+        """Move members/admins arrays of existing groups into the membership collection"""
+        migrated = 0
+        groups = self.group_repository.find_many(
+            {"members": {"$exists": True}},
+            projection={"members": 1, "admins": 1, "created_at": 1}
+        )
+        for group in groups:
+            group_id = str(group["_id"])
+            admins = set(group.get("admins", []))
+            members = group.get("members", [])
+            now = datetime.datetime.now(datetime.timezone.utc)
+            operations = [
+                UpdateOne(
+                    {"group_id": group_id, "user_id": user_id},
+                    {"$setOnInsert": {
+                        "role": "admin" if user_id in admins else "member",
+                        "joined_at": group.get("created_at"),
+                        "created_at": now,
+                        "updated_at": now
+                    }},
+                    upsert=True
+                )
+                for user_id in members
+            ]
+            # One round trip per group; re-running the migration skips existing memberships
+            if operations:
+                self.repository.collection.bulk_write(operations, ordered=False)
+            self.group_repository.collection.update_one(
+                {"_id": group["_id"]},
+                {"$set": {"member_count": len(members)}, "$unset": {"members": "", "admins": ""}}
+            )
+            migrated += 1
+        return migrated
+
+    def _insert(self, group_id: str, user_id: str, role: str) -> bool:
+        """Add a membership unless it exists, return True if it was added"""
+        try:
+            # An upsert stays idempotent even where the unique index has not been created
+            return self.repository.insert_if_absent(
+                {"group_id": group_id, "user_id": user_id},
+                {"role": role, "joined_at": datetime.datetime.now(datetime.timezone.utc)}
+            )
+        except DuplicateKeyError:
+            # A concurrent upsert of the same membership won
+            return False
+
+    def _inc_member_count(self, group_id: str, delta: int) -> bool:
+        try:
+            return self.group_repository.update_one({"_id": ObjectId(group_id)}, {"$inc": {"member_count": delta}})
+        except Exception:
+            return False
+
+
+def main(argv: List[str]) -> int:
+    import settings
+
+    if "--migrate" not in argv:
+        print("Usage: python -m services.membership_store --migrate")
+        return 2
+    store = CollectionMembershipStore(
+        BaseRepository(settings.DB_CONNECTION_STRING, settings.DB_NAME, "group_members"),
+        BaseRepository(settings.DB_CONNECTION_STRING, settings.DB_NAME, "groups")
+    )
+    print(f"✓ Migrated membership of {store.migrate_from_embedded()} groups")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,220 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict, deque
+import datetime
+import threading
+
+# Rough per-message overhead of a DTO dict on top of its content, used for the memory cap
+_DTO_OVERHEAD_BYTES = 600
+_READER_BYTES = 80
+
+
+def _naive_utc(value: datetime.datetime) -> datetime.datetime:
+    """Stored timestamps are naive UTC, make aware ones comparable with them"""
+    if value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _estimate_size(dto: Dict[str, Any]) -> int:
+    return _DTO_OVERHEAD_BYTES + len(dto.get("content") or "") + _READER_BYTES * len(dto.get("read_by", []))
+
+
+class _GroupBuffer:
+    """Newest messages of one group, oldest first"""
+
+    __slots__ = ("entries", "complete", "size")
+
+    def __init__(self, max_messages: int, complete: bool):
+        self.entries: "deque[Tuple[datetime.datetime, Dict[str, Any]]]" = deque(maxlen=max_messages)
+        # True when the buffer holds every message of the group (fewer than max_messages exist)
+        self.complete = complete
+        self.size = 0
+
+
+class RecentMessageCache:
+    """
+    Bounded LRU of the newest message DTOs per group.
+
+    A group is loaded on the first read of its latest page and from then on kept current
+    by the message writes. Groups are evicted by LRU when more than max_groups are cached
+    or the estimated size of all buffers exceeds max_bytes.
+    """
+
+    def __init__(self, max_messages: int = 50, max_groups: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_messages = max_messages
+        self.max_groups = max_groups
+        self.max_bytes = max_bytes
+        self._groups: "OrderedDict[str, _GroupBuffer]" = OrderedDict()
+        self._fills: Dict[str, List[List[bool]]] = {}  # group_id -> stale flags of loads in progress
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_latest(self, group_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Return the newest `limit` messages oldest first, or None if they are not all cached"""
+        with self._lock:
+            buffer = self._groups.get(group_id)
+            if buffer is None or (limit > len(buffer.entries) and not buffer.complete):
+                self.misses += 1
+                return None
+            self._groups.move_to_end(group_id)
+            self.hits += 1
+            return [dict(dto) for _, dto in list(buffer.entries)[-limit:]]
+
+    def begin_fill(self, group_id: str) -> List[bool]:
+        """Register a load of the latest page; writes during the load make it stale"""
+        token = [False]
+        with self._lock:
+            self._fills.setdefault(group_id, []).append(token)
+        return token
+
+    def fill(self, group_id: str, messages: List[Tuple[datetime.datetime, Dict[str, Any]]],
+             token: List[bool]) -> None:
+        """Store the newest messages of a group (oldest first) loaded after begin_fill"""
+        with self._lock:
+            # Tokens are compared by identity, equal flags of concurrent loads are different tokens
+            fills = [fill for fill in self._fills.get(group_id, []) if fill is not token]
+            if fills:
+                self._fills[group_id] = fills
+            else:
+                self._fills.pop(group_id, None)
+            if token[0]:
+                return
+
+            # Without a write since begin_fill the load is current; it also repairs a buffer that
+            # a delete left one short of a full page
+            stale = self._groups.pop(group_id, None)
+            if stale is not None:
+                self._size -= stale.size
+            buffer = _GroupBuffer(self.max_messages, complete=len(messages) < self.max_messages)
+            for created_at, dto in messages[-self.max_messages:]:
+                buffer.entries.append((_naive_utc(created_at), dto))
+                buffer.size += _estimate_size(dto)
+            self._groups[group_id] = buffer
+            self._size += buffer.size
+            self._evict()
+
+    def add(self, group_id: str, created_at: datetime.datetime, dto: Dict[str, Any]) -> None:
+        """Write-through a new message"""
+        with self._lock:
+            self._mark_stale(group_id)
+            buffer = self._groups.get(group_id)
+            if buffer is None:
+                return
+
+            created_at = _naive_utc(created_at)
+            if len(buffer.entries) == buffer.entries.maxlen:
+                _, dropped = buffer.entries[0]
+                self._resize(buffer, -_estimate_size(dropped))
+                buffer.complete = False
+            buffer.entries.append((created_at, dict(dto)))
+            self._resize(buffer, _estimate_size(dto))
+
+            # Concurrent sends can finish out of order
+            if len(buffer.entries) > 1 and buffer.entries[-2][0] > created_at:
+                ordered = sorted(buffer.entries, key=lambda entry: entry[0])
+                buffer.entries.clear()
+                buffer.entries.extend(ordered)
+            self._evict()
+
+    def replace(self, group_id: str, dto: Dict[str, Any]) -> None:
+        """Write-through an edited message if it is cached"""
+        with self._lock:
+            self._mark_stale(group_id)
+            buffer = self._groups.get(group_id)
+            if buffer is None:
+                return
+            for index, (created_at, cached) in enumerate(buffer.entries):
+                if cached["id"] == dto["id"]:
+                    buffer.entries[index] = (created_at, dict(dto))
+                    self._resize(buffer, _estimate_size(dto) - _estimate_size(cached))
+                    return
+
+    def remove(self, group_id: str, message_id: str) -> None:
+        """Write-through a deleted message if it is cached"""
+        with self._lock:
+            self._mark_stale(group_id)
+            buffer = self._groups.get(group_id)
+            if buffer is None:
+                return
+            for entry in buffer.entries:
+                if entry[1]["id"] == message_id:
+                    buffer.entries.remove(entry)
+                    self._resize(buffer, -_estimate_size(entry[1]))
+                    return
+
+    def mark_read(self, group_id: str, user_id: str, up_to: Optional[datetime.datetime] = None,
+                  message_id: Optional[str] = None) -> None:
+        """Add a reader to cached messages (all up to a timestamp, or a single message)"""
+        up_to = _naive_utc(up_to) if up_to else None
+        with self._lock:
+            self._mark_stale(group_id)
+            buffer = self._groups.get(group_id)
+            if buffer is None:
+                return
+            for index, (created_at, dto) in enumerate(buffer.entries):
+                if message_id is not None and dto["id"] != message_id:
+                    continue
+                if up_to is not None and created_at > up_to:
+                    continue
+                if user_id not in dto["read_by"]:
+                    # Copy on write, DTOs handed out earlier keep their own read_by list
+                    buffer.entries[index] = (created_at, dict(dto, read_by=dto["read_by"] + [user_id]))
+                    self._resize(buffer, _READER_BYTES)
+
+    def find_group(self, message_id: str) -> Optional[str]:
+        """Group of a cached message, None if the message is not cached"""
+        with self._lock:
+            for group_id, buffer in self._groups.items():
+                for _, dto in buffer.entries:
+                    if dto["id"] == message_id:
+                        return group_id
+        return None
+
+    def invalidate(self, group_id: str) -> None:
+        """Drop a group from the cache"""
+        with self._lock:
+            self._mark_stale(group_id)
+            buffer = self._groups.pop(group_id, None)
+            if buffer is not None:
+                self._size -= buffer.size
+
+    def clear(self) -> None:
+        """Drop all cached groups"""
+        with self._lock:
+            for group_id in list(self._fills):
+                self._mark_stale(group_id)
+            self._groups.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory use for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "groups": len(self._groups),
+                "max_groups": self.max_groups,
+                "max_messages": self.max_messages,
+                "estimated_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _mark_stale(self, group_id: str) -> None:
+        for token in self._fills.get(group_id, []):
+            token[0] = True
+
+    def _resize(self, buffer: _GroupBuffer, delta: int) -> None:
+        buffer.size += delta
+        self._size += delta
+
+    def _evict(self) -> None:
+        while self._groups and (len(self._groups) > self.max_groups or self._size > self.max_bytes):
+            _, buffer = self._groups.popitem(last=False)
+            self._size -= buffer.size
+            self.evictions += 1
@@ -1,10 +1,46 @@
 from typing import List, Dict, Any, Optional
 from services.base_repository import BaseRepository
+from services.json_provider import iso_or_now
+from services.message_cache import RecentMessageCache
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
 import datetime
+import re
+
+# Fields read by _to_dto
+MESSAGE_DTO_PROJECTION = {
+    "sender_id": 1,
+    "group_id": 1,
+    "content": 1,
+    "type": 1,
+    "read_by": 1,
+    "edited": 1,
+    "reply_to": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
 
 class MessageService:
-    def __init__(self, repository: BaseRepository):
+    INDEXES = [
+        # get_group_messages, unread counts, activity stats
+        IndexModel([("group_id", ASCENDING), ("created_at", DESCENDING)], name="group_id_created_at"),
+        # get_message_thread; only replies carry a reply_to string
+        IndexModel([("reply_to", ASCENDING), ("created_at", ASCENDING)], name="reply_to_created_at",
+                   partialFilterExpression={"reply_to": {"$type": "string"}}),
+        # search; group_id as a suffix key lets the group filter run inside the text index
+        IndexModel([("content", TEXT), ("group_id", ASCENDING)], name="content_text_group_id")
+    ]
+    # Created on every startup, $text search fails without it
+    REQUIRED_INDEXES = ["content_text_group_id"]
+
+    # Upper bound for skip + limit of a search page
+    MAX_SEARCH_WINDOW = 1000
+
+    def __init__(self, repository: BaseRepository, recent_cache: Optional[RecentMessageCache] = None):
         self.repository = repository
+        # Optional in-memory copy of the newest messages of active groups
+        self.recent_cache = recent_cache
+        self._text_search_failed = False
 
     def create_message(self, sender_id: str, group_id: str, content: str, message_type: str = "text") -> Dict[str, Any]:
         """Create a new message"""
@@ -18,53 +54,71 @@ class MessageService:
             "reply_to": None  # For replying to other messages
         }
         
-        message_id = self.repository.create(message_data)
-        return self.get_message(message_id)
+        message = self.repository.create_and_return(message_data)
+        return self._cache_new(message)
 
     def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
         """Get a single message by ID"""
-        message = self.repository.find_by_id(message_id)
+        message = self.repository.find_by_id(message_id, MESSAGE_DTO_PROJECTION)
         return self._to_dto(message) if message else None
 
+    def get_messages(self, message_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get several messages with one query, in the order of message_ids (missing messages are skipped)"""
+        messages = self.repository.find_by_ids(message_ids, MESSAGE_DTO_PROJECTION)
+        return [self._to_dto(message) for message in messages]
+
     def get_group_messages(self, group_id: str, limit: int = 50, before: Optional[datetime.datetime] = None) -> List[Dict[str, Any]]:
         """Get messages for a specific group with pagination"""
         query = {"group_id": group_id}
         
         if before:
             query["created_at"] = {"$lt": before}
+        elif self.recent_cache and 0 < limit <= self.recent_cache.max_messages:
+            return self._get_latest_cached(group_id, limit)
         
         messages = self.repository.find_many(
             query,
             sort_by=[("created_at", -1)],
-            limit=limit
+            limit=limit,
+            projection=MESSAGE_DTO_PROJECTION
         )
         
         # Return in chronological order (oldest first)
         messages.reverse()
         return [self._to_dto(msg) for msg in messages]
 
-    def edit_message(self, message_id: str, new_content: str, user_id: str) -> bool:
-        """Edit a message (only sender can edit)"""
-        message = self.repository.find_by_id(message_id)
-        if not message or message.get("sender_id") != user_id:
-            return False
-        
-        return self.repository.update_by_id(message_id, {
-            "content": new_content,
-            "edited": True
-        })
+    def edit_message(self, message_id: str, new_content: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Edit a message (only sender can edit) and return the edited message"""
+        message = self.repository.update_by_id_and_return(
+            message_id,
+            {"content": new_content, "edited": True},
+            query={"sender_id": user_id}
+        )
+        if not message:
+            return None
+        dto = self._to_dto(message)
+        if self.recent_cache:
+            self.recent_cache.replace(dto["group_id"], dto)
+        return dto
 
-    def delete_message(self, message_id: str, user_id: str) -> bool:
-        """Delete a message (only sender can delete)"""
-        message = self.repository.find_by_id(message_id)
-        if not message or message.get("sender_id") != user_id:
-            return False
-        
-        return self.repository.delete_by_id(message_id)
+    def delete_message(self, message_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Delete a message (only sender can delete) and return the deleted message"""
+        message = self.repository.delete_by_id_and_return(message_id, query={"sender_id": user_id})
+        if not message:
+            return None
+        dto = self._to_dto(message)
+        if self.recent_cache:
+            self.recent_cache.remove(dto["group_id"], dto["id"])
+        return dto
 
     def mark_as_read(self, message_id: str, user_id: str) -> bool:
         """Mark message as read by a user"""
-        return self.repository.add_to_array(message_id, "read_by", user_id)
+        success = self.repository.add_to_array(message_id, "read_by", user_id)
+        if success and self.recent_cache:
+            group_id = self.recent_cache.find_group(message_id)
+            if group_id:
+                self.recent_cache.mark_read(group_id, user_id, message_id=message_id)
+        return success
 
     def mark_group_messages_as_read(self, group_id: str, user_id: str, up_to_timestamp: Optional[datetime.datetime] = None) -> int:
         """Mark all messages in a group as read by a user up to a certain timestamp"""
@@ -80,6 +134,8 @@ class MessageService:
             query,
             {"$addToSet": {"read_by": user_id}}
         )
+        if self.recent_cache:
+            self.recent_cache.mark_read(group_id, user_id, up_to_timestamp)
         
         return result.modified_count
 
@@ -102,21 +158,55 @@ class MessageService:
 
     def search_messages(self, group_id: str, query: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Search messages in a group by content"""
-        messages = self.repository.find_many(
-            {
-                "group_id": group_id,
-                "content": {"$regex": query, "$options": "i"}
-            },
-            sort_by=[("created_at", -1)],
-            limit=limit
+        return self.search(query, [group_id], limit=limit)["results"]
+
+    def search(self, query: str, group_ids: List[str], skip: int = 0, limit: int = 20) -> Dict[str, Any]:
+        """Full-text search in the given groups, best matches first (newest first on equal score)"""
+        query = query.strip()
+        if not query or not group_ids or skip + limit > self.MAX_SEARCH_WINDOW:
+            return {"results": [], "has_more": False}
+
+        group_filter = group_ids[0] if len(group_ids) == 1 else {"$in": group_ids}
+        try:
+            messages = self._text_search(query, group_filter, skip, limit + 1)
+        except (OperationFailure, NotImplementedError) as e:
+            # No content_text_group_id index yet (or a stand-in database without $text)
+            if not self._text_search_failed:
+                self._text_search_failed = True
+                print(f"✗ Text search unavailable, falling back to substring search: {e}")
+            messages = self._substring_search(query, group_filter, skip, limit + 1)
+
+        results = []
+        for message in messages[:limit]:
+            dto = self._to_dto(message)
+            dto["score"] = message.get("score", 0.0)
+            results.append(dto)
+        return {"results": results, "has_more": len(messages) > limit}
+
+    def _text_search(self, query: str, group_filter: Any, skip: int, limit: int) -> List[Dict[str, Any]]:
+        # The text index does stemming and tokenizing, the input is never interpreted as a regex
+        return self.repository.find_many_with_skip(
+            {"$text": {"$search": query}, "group_id": group_filter},
+            sort_by=[("score", {"$meta": "textScore"}), ("created_at", -1)],
+            skip=skip,
+            limit=limit,
+            projection=dict(MESSAGE_DTO_PROJECTION, score={"$meta": "textScore"})
+        )
+
+    def _substring_search(self, query: str, group_filter: Any, skip: int, limit: int) -> List[Dict[str, Any]]:
+        # Unranked, newest first; the input is escaped so it only matches literally
+        return self.repository.find_many_with_skip(
+            {"group_id": group_filter, "content": {"$regex": re.escape(query), "$options": "i"}},
+            sort_by=[("created_at", -1), ("_id", -1)],
+            skip=skip,
+            limit=limit,
+            projection=MESSAGE_DTO_PROJECTION
         )
-        
-        return [self._to_dto(msg) for msg in messages]
 
     def create_reply(self, sender_id: str, group_id: str, content: str, reply_to_message_id: str, message_type: str = "text") -> Dict[str, Any]:
         """Create a reply to another message"""
         # Verify the original message exists and is in the same group
-        original_message = self.repository.find_by_id(reply_to_message_id)
+        original_message = self.repository.find_by_id(reply_to_message_id, {"group_id": 1})
         if not original_message or original_message.get("group_id") != group_id:
             raise ValueError("Invalid message to reply to")
         
@@ -130,14 +220,15 @@ class MessageService:
             "reply_to": reply_to_message_id
         }
         
-        message_id = self.repository.create(message_data)
-        return self.get_message(message_id)
+        message = self.repository.create_and_return(message_data)
+        return self._cache_new(message)
 
     def get_message_thread(self, message_id: str) -> List[Dict[str, Any]]:
         """Get all replies to a specific message"""
         messages = self.repository.find_many(
             {"reply_to": message_id},
-            sort_by=[("created_at", 1)]
+            sort_by=[("created_at", 1)],
+            projection=MESSAGE_DTO_PROJECTION
         )
         
         return [self._to_dto(msg) for msg in messages]
@@ -172,7 +263,8 @@ class MessageService:
         since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours)
         messages = self.repository.find_many(
             {"group_id": group_id, "created_at": {"$gte": since}},
-            sort_by=[("created_at", 1)]
+            sort_by=[("created_at", 1)],
+            projection=dict(MESSAGE_DTO_PROJECTION, edit_history=1)
         )
         return [self._format_message(msg) for msg in messages]
 
@@ -187,10 +279,44 @@ class MessageService:
             "reply_to": message.get("reply_to"),
             "read_by": message.get("read_by", []),
             "edit_history": message.get("edit_history", []),
-            "created_at": message.get("created_at", datetime.datetime.now(datetime.timezone.utc)).isoformat(),
-            "updated_at": message.get("updated_at", datetime.datetime.now(datetime.timezone.utc)).isoformat()
+            "created_at": iso_or_now(message.get("created_at")),
+            "updated_at": iso_or_now(message.get("updated_at"))
         }
 
+    def invalidate_recent(self, group_id: str) -> None:
+        """Drop a group's cached messages (after a change made by another worker)"""
+        if self.recent_cache:
+            self.recent_cache.invalidate(group_id)
+
+    def get_recent_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Get hit-rate and memory counters of the recent message cache"""
+        return self.recent_cache.stats() if self.recent_cache else None
+
+    def _get_latest_cached(self, group_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Serve the latest page from the cache, loading the group's newest messages on a miss"""
+        messages = self.recent_cache.get_latest(group_id, limit)
+        if messages is not None:
+            return messages
+
+        token = self.recent_cache.begin_fill(group_id)
+        docs = self.repository.find_many(
+            {"group_id": group_id},
+            sort_by=[("created_at", -1)],
+            limit=self.recent_cache.max_messages,
+            projection=MESSAGE_DTO_PROJECTION
+        )
+        docs.reverse()
+        dtos = [self._to_dto(doc) for doc in docs]
+        self.recent_cache.fill(group_id, [(doc["created_at"], dto) for doc, dto in zip(docs, dtos)], token)
+        return [dict(dto) for dto in dtos[-limit:]]
+
+    def _cache_new(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a created message to a DTO and add it to the cache"""
+        dto = self._to_dto(message)
+        if self.recent_cache:
+            self.recent_cache.add(dto["group_id"], message["created_at"], dto)
+        return dto
+
     def _to_dto(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Convert database message to DTO"""
         if not message:
@@ -205,6 +331,6 @@ class MessageService:
             "read_by": message.get("read_by", []),
             "edited": message.get("edited", False),
             "reply_to": message.get("reply_to"),
-            "created_at": message.get("created_at", datetime.datetime.now(datetime.timezone.utc)).isoformat(),
-            "updated_at": message.get("updated_at", datetime.datetime.now(datetime.timezone.utc)).isoformat()
+            "created_at": iso_or_now(message.get("created_at")),
+            "updated_at": iso_or_now(message.get("updated_at"))
         } 
\ No newline at end of file
@@ -0,0 +1,249 @@
+from typing import Dict, Any, List, Tuple, Callable, Optional, Sequence
+from flask import Flask, request, g
+import bisect
+import functools
+import inspect
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; from a cache hit to a slow aggregation
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """A metric family; samples are kept per tuple of label values"""
+
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels: Tuple[str, ...], value: Any) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Tuple[str, ...] = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the (unlabelled) value from function at scrape time"""
+        self._function = function
+
+    def collect(self) -> List[str]:
+        if self._function is not None:
+            self.set(self._function())
+        return super().collect()
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # per-bucket counts (the last one is +Inf), sum, count
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, labels: Tuple[str, ...], state: Any) -> List[str]:
+        counts, total, count = state[0][:], state[1], state[2]
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+        label_text = _format_labels(self.label_names, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+        lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format.
+
+    Recording is a dict update under a per-metric lock, so it is cheap enough for every
+    request and socket event. Values are per worker process; scrape each worker.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        """All metrics in the text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception as e:
+                print(f"✗ Failed to collect metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+class RequestMetrics:
+    """
+    Flask hooks recording request durations per route template, method and status.
+
+    With a command monitor (services.mongo_monitoring.CommandMonitor) the MongoDB round
+    trips of each request and the time spent in them are recorded per route as well.
+    """
+
+    # Round trips per request; a handful is normal, dozens point at a per-item query
+    ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+    def __init__(self, registry: MetricsRegistry, command_monitor: Optional[Any] = None):
+        self.duration = registry.histogram(
+            "http_request_duration_seconds", "HTTP request duration", ("route", "method", "status"))
+        self.in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being handled")
+        self.command_monitor = command_monitor
+        if command_monitor is not None:
+            self.round_trips = registry.histogram(
+                "http_request_mongodb_round_trips", "MongoDB commands issued per HTTP request",
+                ("route", "method"), self.ROUND_TRIP_BUCKETS)
+            self.mongodb_duration = registry.histogram(
+                "http_request_mongodb_duration_seconds", "Time per HTTP request spent in MongoDB commands",
+                ("route", "method"))
+
+    def install(self, app: Flask) -> None:
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    @staticmethod
+    def route() -> str:
+        """Route template of the current request; unmatched paths share one label"""
+        return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+    def _before(self) -> None:
+        g.metrics_start = time.perf_counter()
+        self.in_flight.inc()
+        if self.command_monitor is not None:
+            self.command_monitor.start_tally()
+
+    def _after(self, response):
+        start = g.get("metrics_start")
+        if start is not None:
+            route = self.route()
+            self.duration.observe(time.perf_counter() - start, (route, request.method, str(response.status_code)))
+            if self.command_monitor is not None:
+                round_trips, seconds = self.command_monitor.end_tally()
+                self.round_trips.observe(round_trips, (route, request.method))
+                self.mongodb_duration.observe(seconds, (route, request.method))
+        return response
+
+    def _teardown(self, exc) -> None:
+        if g.pop("metrics_start", None) is not None:
+            self.in_flight.dec()
+            if self.command_monitor is not None:
+                self.command_monitor.end_tally()
+
+
+class SocketEventMetrics:
+    """Counts and durations of Socket.IO event handlers per event name"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.events = registry.counter("socketio_events_total", "Socket.IO events handled", ("event", "outcome"))
+        self.duration = registry.histogram(
+            "socketio_event_duration_seconds", "Socket.IO event handler duration", ("event",))
+
+    def instrument(self, event: str, handler: Callable) -> Callable:
+        """Wrap an event handler; call it with the arguments the original accepts"""
+        signature = inspect.signature(handler)
+
+        @functools.wraps(handler)
+        def wrapper(*args):
+            # Flask-SocketIO retries with fewer arguments on TypeError; keep that out of the metrics
+            signature.bind(*args)
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = handler(*args)
+                outcome = "ok"
+                return result
+            finally:
+                self.duration.observe(time.perf_counter() - start, (event,))
+                self.events.inc((event, outcome))
+        return wrapper
@@ -0,0 +1,162 @@
+from typing import Dict, Any, List
+from pymongo import MongoClient, monitoring
+import certifi
+import threading
+import time
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Collects connection pool counters for every client created by the registry"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = threading.local()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        # Check-out runs on the calling thread, so the start time can be kept thread-locally
+        self._pending.started_at = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(waited)
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self._record_wait(waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the pool counters"""
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_time_avg_ms": (self.wait_time_total / self.checkouts * 1000) if self.checkouts else 0.0,
+                "wait_time_max_ms": self.wait_time_max * 1000,
+                "pool_clears": self.pool_clears
+            }
+
+    def _waited(self) -> float:
+        started_at = getattr(self._pending, "started_at", None)
+        self._pending.started_at = None
+        return time.perf_counter() - started_at if started_at is not None else 0.0
+
+    def _record_wait(self, waited: float) -> None:
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+
+
+class MongoClientRegistry:
+    """Hands out one pooled MongoClient per connection string"""
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.pool_metrics = PoolMetricsListener()
+        self.event_listeners: List[Any] = [self.pool_metrics]
+
+    def get_client(self, connection_string: str) -> MongoClient:
+        """Get the shared client for a connection string, creating and pinging it on first use"""
+        with self._lock:
+            client = self._clients.get(connection_string)
+        if client is not None:
+            return client
+
+        # Connect and ping outside the lock so a slow server does not block other connection strings
+        client = self._create_client(connection_string)
+        with self._lock:
+            existing = self._clients.setdefault(connection_string, client)
+        if existing is not client:
+            # Another thread connected first
+            client.close()
+        return existing
+
+    def register_client(self, connection_string: str, client: Any) -> None:
+        """Use an existing client (for example a local stand-in) for a connection string"""
+        with self._lock:
+            self._clients[connection_string] = client
+
+    def close_all(self) -> None:
+        """Close every client and forget them"""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool counters across all clients"""
+        stats = self.pool_metrics.stats()
+        stats["clients"] = len(self._clients)
+        return stats
+
+    def _create_client(self, connection_string: str) -> MongoClient:
+        # Use certifi to provide up-to-date SSL certificates
+        ca = certifi.where()
+
+        client = MongoClient(
+            connection_string,
+            tlsCAFile=ca,
+            connectTimeoutMS=30000,
+            socketTimeoutMS=30000,
+            serverSelectionTimeoutMS=30000,
+            maxPoolSize=50,
+            minPoolSize=5,
+            retryWrites=True,
+            w="majority",
+            event_listeners=list(self.event_listeners)
+        )
+
+        # Test the connection once per client instead of once per collection
+        try:
+            client.admin.command('ping')
+        except Exception:
+            # Stop the monitor threads and pooled connections of the unusable client
+            client.close()
+            raise
+        return client
+
+
+client_registry = MongoClientRegistry()
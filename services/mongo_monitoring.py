@@ -0,0 +1,129 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+from flask import has_request_context, request
+from pymongo import monitoring
+from services.metrics import MetricsRegistry
+import datetime
+import threading
+
+# Command fields that say nothing about the shape of a query
+_IGNORED_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "writeConcern", "readConcern",
+                   "apiVersion", "apiStrict", "apiDeprecationErrors", "autocommit", "startTransaction",
+                   "documents", "ordered", "cursor", "comment"}
+
+
+def query_shape(value: Any) -> Any:
+    """A copy of a command or filter with every value replaced by '?', keeping keys and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Pipelines keep every stage, long $in lists collapse to one entry per distinct shape
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def _collection_name(command_name: str, command: Dict[str, Any]) -> str:
+    target = command.get(command_name)
+    if isinstance(target, str):
+        return target
+    # getMore carries the cursor id under its name
+    collection = command.get("collection")
+    return collection if isinstance(collection, str) else ""
+
+
+def _current_operation() -> Optional[str]:
+    """Route template or socket event the current command runs for, None outside requests"""
+    if not has_request_context():
+        return None
+    event = getattr(request, "event", None)
+    if event:
+        return f"event {event['message']}"
+    return request.url_rule.rule if request.url_rule is not None else request.path
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    pymongo command listener recording latency per collection and command.
+
+    Commands slower than slow_ms are kept with their redacted shape in a ring buffer of
+    the last slow_log_size entries. While a tally is open on a thread (one per HTTP
+    request) the commands issued by that thread are counted, so an endpoint doing one
+    query per item stands out in the request metrics.
+    """
+
+    def __init__(self, registry: MetricsRegistry, slow_ms: float = 100.0, slow_log_size: int = 100):
+        self.duration = registry.histogram(
+            "mongodb_command_duration_seconds", "MongoDB command duration", ("collection", "command"))
+        self.failures = registry.counter(
+            "mongodb_command_failures_total", "Failed MongoDB commands", ("collection", "command"))
+        self.slow_ms = slow_ms
+        self._slow: "deque[Dict[str, Any]]" = deque(maxlen=slow_log_size)
+        self._started: Dict[Tuple[Any, int], Tuple[str, Dict[str, Any], Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def started(self, event) -> None:
+        command = event.command
+        collection = _collection_name(event.command_name, command)
+        key = (event.connection_id, event.request_id)
+        operation = _current_operation()
+        with self._lock:
+            self._started[key] = (collection, command, operation)
+
+    def succeeded(self, event) -> None:
+        self._finished(event, failed=False)
+
+    def failed(self, event) -> None:
+        self._finished(event, failed=True)
+
+    def start_tally(self) -> None:
+        """Start counting the commands of the current thread"""
+        self._local.tally = [0, 0.0]
+
+    def end_tally(self) -> Tuple[int, float]:
+        """Stop counting, return (round trips, seconds spent in them) since start_tally"""
+        tally = getattr(self._local, "tally", None)
+        self._local.tally = None
+        return (tally[0], tally[1]) if tally else (0, 0.0)
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Recorded slow commands, newest first"""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def _finished(self, event, failed: bool) -> None:
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        collection, command, operation = started
+        seconds = event.duration_micros / 1e6
+        labels = (collection, event.command_name)
+        self.duration.observe(seconds, labels)
+        if failed:
+            self.failures.inc(labels)
+
+        tally = getattr(self._local, "tally", None)
+        if tally is not None:
+            tally[0] += 1
+            tally[1] += seconds
+
+        if seconds * 1000 >= self.slow_ms:
+            shape = query_shape({key: value for key, value in command.items()
+                                 if key not in _IGNORED_FIELDS and key != event.command_name})
+            entry = {
+                "collection": collection,
+                "command": event.command_name,
+                "duration_ms": round(seconds * 1000, 3),
+                "shape": shape,
+                "operation": operation,
+                "failed": failed,
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat()
+            }
+            with self._lock:
+                self._slow.append(entry)
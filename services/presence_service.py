@@ -0,0 +1,137 @@
+from typing import Dict, Any, List, Optional, Tuple
+from services.base_repository import BaseRepository
+from services.socket_registry import SocketRegistry
+from bson import ObjectId
+import atexit
+import datetime
+import threading
+import time
+
+class PresenceEngine:
+    """
+    Live presence on top of the socket registry, with write-behind persistence.
+
+    A user is online while they have a socket in the registry. Every worker refreshes the
+    heartbeat of its own connected sockets (and clients refresh theirs with `ping`), so
+    sockets left behind by a crashed worker stop being refreshed and are expired after
+    timeout seconds by any other worker.
+
+    Status and last_active changes are queued per user and written with one bulk write
+    per flush; a newer change of the same user replaces the queued one. A write only
+    applies if it is newer than the stored last_active, so a worker flushing late cannot
+    overwrite a more recent status written by another worker.
+    """
+
+    def __init__(self, registry: SocketRegistry, repository: Optional[BaseRepository] = None,
+                 timeout: float = 90.0):
+        self.registry = registry
+        self.repository = repository
+        self.timeout = timeout
+        self._pending: Dict[str, Dict[str, Any]] = {}  # user_id -> fields to $set
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.expired = 0
+        atexit.register(self.flush)
+
+    def connect(self, socket_id: str, user_id: str) -> bool:
+        """Register a socket, return True if it is the user's first one"""
+        first = self.registry.add_socket(socket_id, user_id)
+        self.registry.touch([socket_id], time.time())
+        return first
+
+    def disconnect(self, socket_id: str) -> Tuple[Optional[str], bool]:
+        """Unregister a socket, return (user_id, True if the user went offline)"""
+        return self.registry.remove_socket(socket_id)
+
+    def heartbeat(self, socket_id: str) -> Optional[str]:
+        """Refresh a socket and the user's last_active, return the user ID"""
+        user_id = self.registry.get_user(socket_id)
+        if user_id:
+            self.registry.touch([socket_id], time.time())
+            self.record_status(user_id)
+        return user_id
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """Refresh this worker's sockets and drop stale ones cluster-wide, return users that went offline"""
+        now = time.time() if now is None else now
+        self.registry.touch(self.registry.local_socket_ids(), now)
+
+        offline = []
+        for socket_id in self.registry.stale_sockets(now - self.timeout):
+            user_id, was_last = self.registry.remove_socket(socket_id)
+            if user_id and was_last:
+                offline.append(user_id)
+                self.record_status(user_id, "offline")
+        with self._lock:
+            self.expired += len(offline)
+        return offline
+
+    def is_online(self, user_id: str) -> bool:
+        return self.registry.is_online(user_id)
+
+    def online_user_ids(self) -> List[str]:
+        return list(self.registry.online_user_ids())
+
+    def record_status(self, user_id: str, status: Optional[str] = None) -> None:
+        """Queue a status change (or only a last_active refresh when status is None)"""
+        fields = {"last_active": datetime.datetime.now(datetime.timezone.utc)}
+        if status:
+            fields["status"] = status
+        with self._lock:
+            self._pending.setdefault(user_id, {}).update(fields)
+
+    def flush(self) -> int:
+        """Write all queued changes with one bulk write, return how many users were written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self.repository is None:
+            return 0
+        try:
+            self.repository.bulk_update_by_ids(pending, newer_field="last_active")
+        except Exception as e:
+            print(f"✗ Failed to write presence of {len(pending)} users: {e}")
+            with self._lock:
+                self.failed += len(pending)
+                # Keep newer changes queued since the failed flush
+                for user_id, fields in pending.items():
+                    self._pending[user_id] = dict(fields, **self._pending.get(user_id, {}))
+            return 0
+        with self._lock:
+            self.written += len(pending)
+        return len(pending)
+
+    def reconcile(self) -> int:
+        """Correct stored statuses that disagree with the registry, return how many were queued"""
+        if self.repository is None:
+            return 0
+        online = self.registry.online_user_ids()
+        # Online without any socket, e.g. the worker died before the offline write
+        stored_online = self.repository.find_many({"status": "online"}, projection={"_id": 1})
+        stale = [str(user["_id"]) for user in stored_online if str(user["_id"]) not in online]
+        # Connected but stored as offline, e.g. an offline write overtook a reconnect
+        object_ids = []
+        for user_id in online:
+            try:
+                object_ids.append(ObjectId(user_id))
+            except Exception:
+                continue
+        stored_offline = self.repository.find_many(
+            {"_id": {"$in": object_ids}, "status": "offline"}, projection={"_id": 1}
+        ) if object_ids else []
+
+        for user_id in stale:
+            self.record_status(user_id, "offline")
+        for user in stored_offline:
+            self.record_status(str(user["_id"]), "online")
+        return len(stale) + len(stored_offline)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending_writes": len(self._pending),
+                "written": self.written,
+                "failed": self.failed,
+                "expired": self.expired,
+                "timeout": self.timeout
+            }
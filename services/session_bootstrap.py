@@ -0,0 +1,150 @@
+from typing import Dict, Any, List, Callable, Set, Tuple
+from services.user_service import UserService
+import threading
+
+class SessionAdmissionQueue:
+    """
+    Bounded admission queue for socket session bootstraps.
+
+    Sessions are processed by a fixed number of background workers, so a reconnect storm
+    turns into a steady stream of bootstraps instead of thousands of concurrent ones.
+    Sockets of a user that are still waiting are coalesced into one bootstrap.
+    """
+
+    def __init__(self, handler: Callable[[str, List[str]], None], create_queue: Callable[[], Any],
+                 start_task: Callable, workers: int = 8, max_pending: int = 10000):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue = create_queue()
+        self._start_task = start_task
+        self._pending: Dict[str, Set[str]] = {}  # user_id -> sids waiting for a bootstrap
+        self._lock = threading.Lock()
+        self._started = False
+        self.admitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Start the worker tasks (once)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.workers):
+            self._start_task(self._worker)
+
+    def submit(self, user_id: str, sid: str) -> bool:
+        """Queue a socket for bootstrap, return False if the queue is full"""
+        with self._lock:
+            sids = self._pending.get(user_id)
+            if sids is not None:
+                sids.add(sid)
+                self.coalesced += 1
+                return True
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._pending[user_id] = {sid}
+            self.admitted += 1
+        self._queue.put(user_id)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters"""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "workers": self.workers,
+                "admitted": self.admitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "processed": self.processed,
+                "failed": self.failed
+            }
+
+    def _worker(self) -> None:
+        while True:
+            user_id = self._queue.get()
+            with self._lock:
+                sids = self._pending.pop(user_id, set())
+            try:
+                self.handler(user_id, list(sids))
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"Error bootstrapping session of user {user_id}: {e}")
+
+
+class StatusNotifier:
+    """
+    Deferred friend notifications for status changes, coalesced per recipient.
+
+    notify() is called on every online/offline transition and only records the first and
+    the latest status of a user in the current window; a user whose latest status undoes
+    the first one (e.g. a reconnect within the window) is dropped. flush() loads the friend
+    lists of the remaining users with one query and collects the changes for each recipient
+    into one batch; recipients with the same batch share a single deliver call.
+    """
+
+    def __init__(self, user_service: UserService, deliver: Callable[[List[Dict[str, str]], List[str]], None]):
+        self.user_service = user_service
+        self.deliver = deliver
+        self._pending: Dict[str, Tuple[str, str]] = {}  # user_id -> (first, latest) status in this window
+        self._lock = threading.Lock()
+        self.notified = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.flushes = 0
+
+    def notify(self, user_id: str, status: str) -> None:
+        """Schedule a status notification; a newer status of the same user replaces it"""
+        with self._lock:
+            first, _ = self._pending.get(user_id, (status, status))
+            self._pending[user_id] = (first, status)
+
+    def flush(self) -> int:
+        """Deliver all pending notifications, return how many users were announced"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            # Transitions alternate, so a latest status other than the first is the state before the window
+            changes = {user_id: latest for user_id, (first, latest) in pending.items() if first == latest}
+            self.deduplicated += len(pending) - len(changes)
+        if not changes:
+            return 0
+
+        # recipient -> their changes, in the order the users were notified
+        batches: Dict[str, List[Dict[str, str]]] = {}
+        friends = self.user_service.get_friend_ids_many(list(changes))
+        for user_id, status in changes.items():
+            for friend_id in friends.get(user_id, []):
+                batches.setdefault(friend_id, []).append({"user_id": user_id, "status": status})
+
+        # Recipients with identical batches (e.g. all friends of a single user) get one emit
+        recipients: Dict[Tuple[Tuple[str, str], ...], List[str]] = {}
+        for friend_id, batch in batches.items():
+            key = tuple((change["user_id"], change["status"]) for change in batch)
+            recipients.setdefault(key, []).append(friend_id)
+        for friend_ids in recipients.values():
+            self.deliver(batches[friend_ids[0]], friend_ids)
+
+        with self._lock:
+            self.notified += len(changes)
+            self.batches += len(recipients)
+            self.flushes += 1
+        return len(changes)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "notified": self.notified,
+                "deduplicated": self.deduplicated,
+                "batches": self.batches,
+                "flushes": self.flushes
+            }
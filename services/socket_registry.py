@@ -0,0 +1,228 @@
+from typing import Dict, Set, Tuple, Optional, Any, Iterable, List
+import abc
+import threading
+
+class SocketRegistry(abc.ABC):
+    """
+    Tracks which sockets belong to which user, across every worker sharing the registry.
+
+    Local sockets are the ones connected to this process; room operations can only be
+    applied to them, while emits and presence decisions use the cluster-wide view.
+    """
+
+    @abc.abstractmethod
+    def add_socket(self, socket_id: str, user_id: str) -> bool:
+        """Register a socket for a user, return True if it is the user's first socket"""
+        pass
+
+    @abc.abstractmethod
+    def remove_socket(self, socket_id: str) -> Tuple[Optional[str], bool]:
+        """Unregister a socket, return (user_id, True if it was the user's last socket)"""
+        pass
+
+    @abc.abstractmethod
+    def get_user(self, socket_id: str) -> Optional[str]:
+        """Get the user a socket belongs to"""
+        pass
+
+    @abc.abstractmethod
+    def get_sockets(self, user_id: str) -> Set[str]:
+        """Get all sockets of a user on every worker"""
+        pass
+
+    @abc.abstractmethod
+    def online_user_ids(self) -> Set[str]:
+        """Get the IDs of all users with at least one socket"""
+        pass
+
+    @abc.abstractmethod
+    def socket_count(self) -> int:
+        """Count connected sockets"""
+        pass
+
+    @abc.abstractmethod
+    def user_count(self) -> int:
+        """Count connected users"""
+        pass
+
+    @abc.abstractmethod
+    def touch(self, socket_ids: Iterable[str], now: float) -> None:
+        """Record a heartbeat for sockets"""
+        pass
+
+    @abc.abstractmethod
+    def stale_sockets(self, before: float) -> List[str]:
+        """Sockets on any worker whose last heartbeat is older than before"""
+        pass
+
+    def is_online(self, user_id: str) -> bool:
+        """Check if a user has at least one socket"""
+        return bool(self.get_sockets(user_id))
+
+    def get_local_sockets(self, user_id: str) -> Set[str]:
+        """Get the sockets of a user connected to this process"""
+        return set(self._local_sockets.get(user_id, ()))
+
+    def local_socket_ids(self) -> List[str]:
+        """Get all sockets connected to this process"""
+        return [sid for sockets in list(self._local_sockets.values()) for sid in list(sockets)]
+
+    def _track_local(self, socket_id: str, user_id: str) -> None:
+        self._local_sockets.setdefault(user_id, set()).add(socket_id)
+
+    def _untrack_local(self, socket_id: str, user_id: str) -> None:
+        sockets = self._local_sockets.get(user_id)
+        if sockets is not None:
+            sockets.discard(socket_id)
+            if not sockets:
+                del self._local_sockets[user_id]
+
+
+class InMemorySocketRegistry(SocketRegistry):
+    """Single-process registry backed by plain dictionaries"""
+
+    def __init__(self):
+        self.connected_users: Dict[str, str] = {}  # socket_id -> user_id
+        self.user_sockets: Dict[str, Set[str]] = {}  # user_id -> set of socket_ids
+        self._local_sockets = self.user_sockets
+        self.heartbeats: Dict[str, float] = {}  # socket_id -> time of last heartbeat
+        self._lock = threading.Lock()
+
+    def add_socket(self, socket_id: str, user_id: str) -> bool:
+        with self._lock:
+            self.connected_users[socket_id] = user_id
+            first = user_id not in self.user_sockets
+            self._track_local(socket_id, user_id)
+            return first
+
+    def remove_socket(self, socket_id: str) -> Tuple[Optional[str], bool]:
+        with self._lock:
+            user_id = self.connected_users.pop(socket_id, None)
+            self.heartbeats.pop(socket_id, None)
+            if user_id is None:
+                return None, False
+            self._untrack_local(socket_id, user_id)
+            return user_id, user_id not in self.user_sockets
+
+    def get_user(self, socket_id: str) -> Optional[str]:
+        return self.connected_users.get(socket_id)
+
+    def get_sockets(self, user_id: str) -> Set[str]:
+        return set(self.user_sockets.get(user_id, ()))
+
+    def online_user_ids(self) -> Set[str]:
+        return set(self.user_sockets.keys())
+
+    def socket_count(self) -> int:
+        return len(self.connected_users)
+
+    def user_count(self) -> int:
+        return len(self.user_sockets)
+
+    def touch(self, socket_ids: Iterable[str], now: float) -> None:
+        with self._lock:
+            for socket_id in socket_ids:
+                if socket_id in self.connected_users:
+                    self.heartbeats[socket_id] = now
+
+    def stale_sockets(self, before: float) -> List[str]:
+        with self._lock:
+            return [sid for sid, seen in self.heartbeats.items() if seen < before]
+
+
+class RedisSocketRegistry(SocketRegistry):
+    """
+    Registry shared by all workers through a Redis-protocol server.
+
+    Layout (all keys under the prefix):
+    sockets -- hash socket_id -> user_id;
+    user_sockets:<user_id> -- set of the user's socket ids;
+    online -- set of user ids with at least one socket;
+    heartbeats -- sorted set of socket ids scored by the time of their last heartbeat.
+    """
+
+    def __init__(self, client: Any, prefix: str = "chat"):
+        self.client = client
+        self.prefix = prefix
+        self._local_sockets: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def add_socket(self, socket_id: str, user_id: str) -> bool:
+        pipe = self.client.pipeline()
+        pipe.hset(self._key("sockets"), socket_id, user_id)
+        pipe.sadd(self._user_key(user_id), socket_id)
+        pipe.sadd(self._key("online"), user_id)
+        pipe.scard(self._user_key(user_id))
+        results = pipe.execute()
+        with self._lock:
+            self._track_local(socket_id, user_id)
+        return results[3] == 1
+
+    def remove_socket(self, socket_id: str) -> Tuple[Optional[str], bool]:
+        from redis.exceptions import WatchError  # Optional dependency, installed with the Redis backend
+
+        # WATCH on the user's socket set makes the removal atomic: a concurrent add_socket or a
+        # second removal of the same socket aborts the transaction and it is retried
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    user_id = self._decode(self.client.hget(self._key("sockets"), socket_id))
+                    if user_id is None:
+                        self.client.zrem(self._key("heartbeats"), socket_id)
+                        return None, False
+
+                    user_key = self._user_key(user_id)
+                    pipe.watch(user_key)
+                    if self._decode(pipe.hget(self._key("sockets"), socket_id)) != user_id:
+                        pipe.unwatch()
+                        continue
+                    remaining = pipe.scard(user_key) - (1 if pipe.sismember(user_key, socket_id) else 0)
+
+                    pipe.multi()
+                    pipe.hdel(self._key("sockets"), socket_id)
+                    pipe.srem(user_key, socket_id)
+                    pipe.zrem(self._key("heartbeats"), socket_id)
+                    if remaining == 0:
+                        pipe.srem(self._key("online"), user_id)
+                    removed = pipe.execute()[0] == 1
+                except WatchError:
+                    continue
+            with self._lock:
+                self._untrack_local(socket_id, user_id)
+            # Only the worker whose HDEL removed the socket reports the offline transition
+            return user_id, removed and remaining == 0
+
+    def get_user(self, socket_id: str) -> Optional[str]:
+        return self._decode(self.client.hget(self._key("sockets"), socket_id))
+
+    def get_sockets(self, user_id: str) -> Set[str]:
+        return {self._decode(sid) for sid in self.client.smembers(self._user_key(user_id))}
+
+    def online_user_ids(self) -> Set[str]:
+        return {self._decode(uid) for uid in self.client.smembers(self._key("online"))}
+
+    def socket_count(self) -> int:
+        return self.client.hlen(self._key("sockets"))
+
+    def user_count(self) -> int:
+        return self.client.scard(self._key("online"))
+
+    def touch(self, socket_ids: Iterable[str], now: float) -> None:
+        scores = {socket_id: now for socket_id in socket_ids}
+        if scores:
+            self.client.zadd(self._key("heartbeats"), scores)
+
+    def stale_sockets(self, before: float) -> List[str]:
+        return [self._decode(sid) for sid in self.client.zrangebyscore(self._key("heartbeats"), "-inf", f"({before}")]
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.prefix}:user_sockets:{user_id}"
+
+    @staticmethod
+    def _decode(value: Any) -> Optional[str]:
+        if isinstance(value, bytes):
+            return value.decode()
+        return value
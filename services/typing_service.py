@@ -0,0 +1,77 @@
+from typing import Dict, List, Tuple, Optional
+import threading
+import time
+
+class TypingStateStore:
+    """
+    In-memory typing indicators with per-entry expiry.
+
+    Each (group, user) entry expires ttl seconds after the last typing_start, so a client
+    that never sends typing_stop is cleared by expire(). Repeated typing_start events only
+    refresh the expiry and ask for a new broadcast once every throttle seconds.
+    """
+
+    def __init__(self, ttl: float = 6.0, throttle: float = 2.0):
+        self.ttl = ttl
+        self.throttle = throttle
+        self._groups: Dict[str, Dict[str, List[float]]] = {}  # group_id -> user_id -> [expires_at, last_broadcast]
+        self._lock = threading.Lock()
+
+    def start(self, group_id: str, user_id: str, now: Optional[float] = None) -> bool:
+        """Mark user as typing, return True if a typing event should be broadcast"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            users = self._groups.setdefault(group_id, {})
+            entry = users.get(user_id)
+            if entry and now - entry[1] < self.throttle:
+                entry[0] = now + self.ttl
+                return False
+            users[user_id] = [now + self.ttl, now]
+            return True
+
+    def stop(self, group_id: str, user_id: str) -> bool:
+        """Clear user's typing state, return True if the user was typing"""
+        with self._lock:
+            users = self._groups.get(group_id)
+            if not users or user_id not in users:
+                return False
+            del users[user_id]
+            if not users:
+                del self._groups[group_id]
+            return True
+
+    def clear_user(self, user_id: str) -> List[str]:
+        """Clear user's typing state in every group, return the affected group IDs"""
+        cleared = []
+        with self._lock:
+            for group_id in list(self._groups):
+                users = self._groups[group_id]
+                if users.pop(user_id, None) is not None:
+                    cleared.append(group_id)
+                    if not users:
+                        del self._groups[group_id]
+        return cleared
+
+    def expire(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Remove expired entries, return them as (group_id, user_id) pairs"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        with self._lock:
+            for group_id in list(self._groups):
+                users = self._groups[group_id]
+                for user_id in [uid for uid, entry in users.items() if entry[0] <= now]:
+                    del users[user_id]
+                    expired.append((group_id, user_id))
+                if not users:
+                    del self._groups[group_id]
+        return expired
+
+    def get_typing_users(self, group_id: str) -> List[str]:
+        """Get users currently typing in a group"""
+        with self._lock:
+            return list(self._groups.get(group_id, {}))
+
+    def get_typing_groups(self, user_id: str) -> List[str]:
+        """Get groups a user is currently typing in"""
+        with self._lock:
+            return [group_id for group_id, users in self._groups.items() if user_id in users]
@@ -0,0 +1,75 @@
+from typing import List, Dict, Callable, Optional
+from services.base_repository import BaseRepository
+from pymongo import IndexModel, ASCENDING
+import datetime
+
+class UnreadCounterService:
+    """
+    Materialized per-(user, group) unread message counters.
+
+    Counter documents are created lazily: the first read for a group computes the count
+    from the messages collection and stores it; from then on message sends increment it
+    and marking the group as read resets it.
+    """
+
+    INDEXES = [
+        # get_counts for a user, set_count / remove for a (user, group) pair
+        IndexModel([("user_id", ASCENDING), ("group_id", ASCENDING)], name="user_id_group_id", unique=True),
+        # increment_for_group, decrement_for_group, remove_group
+        IndexModel([("group_id", ASCENDING)], name="group_id")
+    ]
+    # Created on every startup, the set_count upserts rely on one counter per (user, group)
+    REQUIRED_INDEXES = ["user_id_group_id"]
+
+    def __init__(self, repository: BaseRepository):
+        self.repository = repository
+
+    def increment_for_group(self, group_id: str, sender_id: str) -> int:
+        """Count a new message as unread for every member except the sender"""
+        return self.repository.update_many(
+            {"group_id": group_id, "user_id": {"$ne": sender_id}},
+            {"$inc": {"count": 1}}
+        )
+
+    def decrement_for_group(self, group_id: str, read_by: List[str]) -> int:
+        """Uncount a deleted message for the members who had not read it"""
+        return self.repository.update_many(
+            {"group_id": group_id, "user_id": {"$nin": read_by}, "count": {"$gt": 0}},
+            {"$inc": {"count": -1}}
+        )
+
+    def set_count(self, group_id: str, user_id: str, count: int = 0) -> bool:
+        """Set the unread count of a user in a group (0 after marking everything read)"""
+        return self.repository.upsert_one(
+            {"user_id": user_id, "group_id": group_id},
+            {"$set": {"count": count}}
+        )
+
+    def remove(self, group_id: str, user_id: str) -> bool:
+        """Drop the counter of a user who left a group"""
+        return self.repository.delete_many({"user_id": user_id, "group_id": group_id}) > 0
+
+    def remove_group(self, group_id: str) -> int:
+        """Drop all counters of a deleted group"""
+        return self.repository.delete_many({"group_id": group_id})
+
+    def get_counts(self, user_id: str, group_ids: List[str],
+                   backfill: Optional[Callable[[str], int]] = None) -> Dict[str, int]:
+        """Get unread counts for the given groups of a user, only groups with unread messages are returned"""
+        counters = self.repository.find_many(
+            {"user_id": user_id, "group_id": {"$in": group_ids}},
+            projection={"group_id": 1, "count": 1}
+        )
+        counts = {counter["group_id"]: counter.get("count", 0) for counter in counters}
+
+        if backfill:
+            for group_id in group_ids:
+                if group_id not in counts:
+                    counts[group_id] = backfill(group_id)
+                    self.repository.upsert_one(
+                        {"user_id": user_id, "group_id": group_id},
+                        {"$setOnInsert": {"count": counts[group_id],
+                                          "created_at": datetime.datetime.now(datetime.timezone.utc)}}
+                    )
+
+        return {group_id: count for group_id, count in counts.items() if count > 0}
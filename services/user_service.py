@@ -1,18 +1,51 @@
 from typing import Optional, Dict, Any, List
 from werkzeug.security import generate_password_hash, check_password_hash
 from services.base_repository import BaseRepository
+from services.json_provider import iso_or_now
+from services.autocomplete import PrefixIndex
+from services.presence_service import PresenceEngine
+from services.typing_service import TypingStateStore
+from pymongo import IndexModel, ASCENDING
 import datetime
 
 DEFAULT_PROFILE_PIC = "https://i.imgur.com/V4RclNb.png" # A generic user icon
 
+# Fields read by _to_dto, so bulk reads never ship password hashes
+USER_DTO_PROJECTION = {
+    "username": 1,
+    "profile_pic": 1,
+    "status": 1,
+    "friends": 1,
+    "last_active": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+USER_AUTH_PROJECTION = dict(USER_DTO_PROJECTION, password=1)
+
 class UserService:
-    def __init__(self, repository: BaseRepository):
+    INDEXES = [
+        # login, registration uniqueness check, find_by_username
+        IndexModel([("username", ASCENDING)], name="username", unique=True),
+        # get_online_users, PresenceEngine.reconcile
+        IndexModel([("status", ASCENDING)], name="status")
+    ]
+    # Created on every startup, registration relies on the unique username
+    REQUIRED_INDEXES = ["username"]
+
+    def __init__(self, repository: BaseRepository, name_index: Optional[PrefixIndex] = None,
+                 status_writer: Optional[PresenceEngine] = None, typing_state: Optional[TypingStateStore] = None):
         self.repository = repository
+        # Optional in-memory username index used by suggest_users
+        self.name_index = name_index
+        # Optional write-behind queue for status and last_active updates
+        self.status_writer = status_writer
+        # Optional in-memory typing indicators shipped as is_typing_in
+        self.typing_state = typing_state
 
     def create_user(self, username: str, password: str, profile_pic: str = "") -> Dict[str, Any]:
         """Create a new user with hashed password"""
         # Check if username already exists
-        existing_user = self.repository.find_one({"username": username})
+        existing_user = self.repository.find_one({"username": username}, {"_id": 1})
         if existing_user:
             raise ValueError("Username already exists")
 
@@ -22,16 +55,17 @@ class UserService:
             "profile_pic": profile_pic or DEFAULT_PROFILE_PIC,
             "status": "offline",
             "friends": [],
-            "last_active": datetime.datetime.now(datetime.timezone.utc),
-            "is_typing_in": None  # group_id where user is currently typing, None if not typing
+            "last_active": datetime.datetime.now(datetime.timezone.utc)
         }
         
-        user_id = self.repository.create(user_data)
-        return self.find_by_id(user_id)
+        user = self.repository.create_and_return(user_data)
+        if self.name_index is not None:
+            self.name_index.add(str(user["_id"]), username)
+        return self._to_dto(user)
 
     def authenticate_user(self, username: str, password: str) -> Optional[Dict[str, Any]]:
         """Authenticate user with username and password"""
-        user = self.repository.find_one({"username": username})
+        user = self.repository.find_one({"username": username}, USER_AUTH_PROJECTION)
         if user and check_password_hash(user["password"], password):
             # Update last active time and set status to online
             self.update_status(str(user["_id"]), "online")
@@ -40,27 +74,35 @@ class UserService:
 
     def find_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Find user by ID"""
-        user = self.repository.find_by_id(user_id)
+        user = self.repository.find_by_id(user_id, USER_DTO_PROJECTION)
         return self._to_dto(user) if user else None
 
+    def find_by_ids(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """Find several users with one query, in the order of user_ids (missing users are skipped)"""
+        users = self.repository.find_by_ids(user_ids, USER_DTO_PROJECTION)
+        return [self._to_dto(user) for user in users]
+
     def find_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Find user by username"""
-        user = self.repository.find_one({"username": username})
+        user = self.repository.find_one({"username": username}, USER_DTO_PROJECTION)
         return self._to_dto(user) if user else None
 
-    def update_user(self, user_id: str, data: Dict[str, Any]) -> bool:
-        """Update user data (excluding password and sensitive fields)"""
+    def update_user(self, user_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update user data (excluding password and sensitive fields) and return the updated user"""
         allowed_fields = ["username", "profile_pic"]
         update_data = {k: v for k, v in data.items() if k in allowed_fields}
         
         if not update_data:
-            return False
+            return None
             
-        return self.repository.update_by_id(user_id, update_data)
+        user = self.repository.update_by_id_and_return(user_id, update_data, projection=USER_DTO_PROJECTION)
+        if user and "username" in update_data and self.name_index is not None:
+            self.name_index.add(user_id, user["username"])
+        return self._to_dto(user) if user else None
 
     def update_password(self, user_id: str, old_password: str, new_password: str) -> bool:
         """Update user password with verification"""
-        user = self.repository.find_by_id(user_id)
+        user = self.repository.find_by_id(user_id, {"password": 1})
         if not user or not check_password_hash(user["password"], old_password):
             return False
         
@@ -69,6 +111,10 @@ class UserService:
 
     def update_status(self, user_id: str, status: str) -> bool:
         """Update user status and last active time"""
+        if self.status_writer is not None:
+            # Written with the next presence flush
+            self.status_writer.record_status(user_id, status)
+            return True
         return self.repository.update_by_id(user_id, {
             "status": status,
             "last_active": datetime.datetime.now(datetime.timezone.utc)
@@ -90,37 +136,50 @@ class UserService:
 
     def get_friends(self, user_id: str) -> List[Dict[str, Any]]:
         """Get user's friends list with their details"""
-        user = self.repository.find_by_id(user_id)
-        if not user or "friends" not in user:
+        friend_ids = self.get_friend_ids(user_id)
+        if not friend_ids:
             return []
         
-        friends = []
-        for friend_id in user["friends"]:
-            friend = self.find_by_id(friend_id)
-            if friend:
-                friends.append(friend)
-        return friends
-
-    def set_typing_status(self, user_id: str, group_id: str, is_typing: bool) -> bool:
-        """Set user's typing status in a specific group"""
-        if is_typing:
-            return self.repository.add_to_array(user_id, "is_typing_in", group_id)
-        else:
-            return self.repository.remove_from_array(user_id, "is_typing_in", group_id)
+        friends = self.repository.find_by_ids(friend_ids, USER_DTO_PROJECTION)
+        return [self._to_dto(friend) for friend in friends]
+
+    def get_friend_ids(self, user_id: str) -> List[str]:
+        """Get only the IDs of user's friends (for presence notifications)"""
+        user = self.repository.find_by_id(user_id, {"friends": 1})
+        return user.get("friends", []) if user else []
+
+    def get_friend_ids_many(self, user_ids: List[str]) -> Dict[str, List[str]]:
+        """Get the friend IDs of several users with one query"""
+        users = self.repository.find_by_ids(user_ids, {"friends": 1})
+        return {str(user["_id"]): user.get("friends", []) for user in users}
 
     def get_online_users(self) -> List[Dict[str, Any]]:
         """Get all currently online users"""
-        users = self.repository.find_many({"status": "online"})
+        users = self.repository.find_many({"status": "online"}, projection=USER_DTO_PROJECTION)
         return [self._to_dto(user) for user in users]
 
     def search_users(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search users by username"""
+        """Search users by username (substring match, see suggest_users for prefix autocomplete)"""
         users = self.repository.find_many(
             {"username": {"$regex": query, "$options": "i"}},
-            limit=limit
+            limit=limit,
+            projection=USER_DTO_PROJECTION
         )
         return [self._to_dto(user) for user in users]
 
+    def suggest_users(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Autocomplete usernames from the in-memory index without a database read"""
+        if self.name_index is None:
+            return []
+        return [{"id": user_id, "username": name} for user_id, name in self.name_index.search(prefix, limit)]
+
+    def load_name_index(self) -> int:
+        """Fill the username index from the database, return the number of users"""
+        if self.name_index is None:
+            self.name_index = PrefixIndex()
+        users = self.repository.find_many({}, projection={"username": 1})
+        return self.name_index.load((str(user["_id"]), user.get("username", "")) for user in users)
+
     def _to_dto(self, user: Dict[str, Any]) -> Dict[str, Any]:
         """Convert database user to DTO (without password)"""
         if not user:
@@ -132,8 +191,9 @@ class UserService:
             "profile_pic": user.get("profile_pic", ""),
             "status": user.get("status", "offline"),
             "friends": user.get("friends", []),
-            "last_active": user.get("last_active", datetime.datetime.now(datetime.timezone.utc)).isoformat(),
-            "is_typing_in": user.get("is_typing_in", None),
-            "created_at": user.get("created_at", datetime.datetime.now(datetime.timezone.utc)).isoformat(),
-            "updated_at": user.get("updated_at", datetime.datetime.now(datetime.timezone.utc)).isoformat()
+            "last_active": iso_or_now(user.get("last_active")),
+            # Typing indicators live in memory only; a persisted is_typing_in is ignored
+            "is_typing_in": self.typing_state.get_typing_groups(str(user["_id"])) if self.typing_state else [],
+            "created_at": iso_or_now(user.get("created_at")),
+            "updated_at": iso_or_now(user.get("updated_at"))
         } 
\ No newline at end of file
@@ -0,0 +1,16 @@
+import uuid
+import pytest
+from services.mongo_client_registry import client_registry
+
+MONGO_URL = "mongodb://tests.invalid:27017/"
+
+
+@pytest.fixture
+def make_repository():
+    """Build BaseRepository instances on a fresh mongomock database"""
+    mongomock = pytest.importorskip("mongomock")
+    from services.base_repository import BaseRepository
+
+    client_registry.register_client(MONGO_URL, mongomock.MongoClient())
+    db_name = f"test_{uuid.uuid4().hex[:8]}"
+    return lambda collection_name: BaseRepository(MONGO_URL, db_name, collection_name)
@@ -0,0 +1,34 @@
+from services.autocomplete import PrefixIndex
+from services.user_service import UserService
+from services.group_service import GroupService
+
+
+def test_prefix_index_matches_names_and_words():
+    index = PrefixIndex()
+    index.load([("1", "Émile Zola"), ("2", "Team Chat"), ("3", "emily")])
+
+    assert index.search("emi") == [("1", "Émile Zola"), ("3", "emily")]
+    assert index.search("CHA") == [("2", "Team Chat")]
+    index.remove("2")
+    assert index.search("cha") == []
+    assert index.search("") == []
+
+
+def test_user_search_keeps_substring_matching(make_repository):
+    service = UserService(make_repository("users"), PrefixIndex())
+    service.create_user("alice", "pw")
+    service.create_user("malice", "pw")
+
+    assert {user["username"] for user in service.search_users("lic")} == {"alice", "malice"}
+    assert len(service.search_users("")) == 2
+    assert [user["username"] for user in service.suggest_users("ali")] == ["alice"]
+
+
+def test_group_search_keeps_substring_matching(make_repository):
+    service = GroupService(make_repository("groups"), name_index=PrefixIndex())
+    service.create_group("Book club", "u1")
+    service.create_group("Secret club", "u1", is_private=True)
+
+    assert [group["name"] for group in service.search_groups("club")] == ["Book club"]
+    assert [group["name"] for group in service.search_groups("")] == ["Book club"]
+    assert service.suggest_groups("sec") == []
@@ -0,0 +1,10 @@
+def test_reads_leave_shared_projections_untouched(make_repository):
+    repository = make_repository("items")
+    item_id = repository.create({"name": "a", "secret": "b"})
+    projection = {"name": 1}
+
+    assert set(repository.find_by_id(item_id, projection)) == {"_id", "name"}
+    repository.find_many({}, projection=projection)
+    repository.find_many_with_skip({}, projection=projection)
+    repository.find_by_ids([item_id], projection)
+    assert projection == {"name": 1}
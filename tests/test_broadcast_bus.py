@@ -0,0 +1,43 @@
+import pytest
+from services.broadcast_bus import InMemoryBroadcastBus, RedisBroadcastBus
+
+
+def test_in_memory_bus_delivers_synchronously():
+    bus = InMemoryBroadcastBus()
+    received = []
+    bus.subscribe("names", received.append)
+    bus.publish("names", {"id": "1"})
+    assert len(received) == 1
+    assert received[0]["id"] == "1"
+    assert bus.is_local(received[0])
+
+
+def test_failing_handler_does_not_stop_others():
+    bus = InMemoryBroadcastBus()
+    received = []
+    bus.subscribe("names", lambda message: 1 / 0)
+    bus.subscribe("names", received.append)
+    bus.publish("names", {"id": "1"})
+    assert len(received) == 1
+
+
+def test_redis_bus_delivers_to_every_worker():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    publisher = RedisBroadcastBus(fakeredis.FakeRedis(server=server))
+    subscriber = RedisBroadcastBus(fakeredis.FakeRedis(server=server))
+    # Subscribe through the pubsub only; the listener thread is not needed for the test
+    subscriber._thread = object()
+    received = []
+    subscriber.subscribe("membership", received.append)
+    subscriber.subscribe("names", lambda message: None)
+
+    publisher.publish("membership", {"group_id": "g1"})
+    # Subscription confirmations are skipped by poll without delivering anything
+    for _ in range(10):
+        if subscriber.poll(timeout=0.1):
+            break
+    assert received[0]["group_id"] == "g1"
+    assert not subscriber.is_local(received[0])
+    assert received[0]["origin"] == publisher.node_id
+    subscriber.close()
@@ -0,0 +1,83 @@
+import datetime
+import types
+import pytest
+from bson import ObjectId
+from services import change_log_service
+from services.change_log_service import ChangeLogService, MESSAGE_CREATED
+
+
+class Clock:
+    """Stands in for the datetime module of change_log_service, shifted by offset seconds"""
+
+    def __init__(self):
+        self.offset = 0.0
+        clock = self
+
+        class ShiftedDatetime(datetime.datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.datetime.now(tz) + datetime.timedelta(seconds=clock.offset)
+
+        self.module = types.SimpleNamespace(datetime=ShiftedDatetime, timedelta=datetime.timedelta,
+                                            timezone=datetime.timezone)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(change_log_service, "datetime", clock.module)
+    return clock
+
+
+@pytest.fixture
+def change_log(make_repository, clock):
+    return ChangeLogService(make_repository("changes"), settle_seconds=2)
+
+
+def record_message(change_log, group_id, content):
+    return change_log.record(MESSAGE_CREATED, group_id, {"content": content})
+
+
+def test_a_missing_or_unknown_cursor_resets(change_log):
+    for cursor in (None, "", "not-an-id", str(ObjectId.from_datetime(datetime.datetime(2000, 1, 1)))):
+        result = change_log.get_changes("u1", ["g1"], cursor)
+        assert result["reset"] is True
+        assert result["changes"] == []
+        ObjectId(result["cursor"])
+
+
+def test_changes_after_the_cursor_in_the_users_groups(change_log, clock):
+    cursor = change_log.get_changes("u1", ["g1"])["cursor"]
+    record_message(change_log, "g1", "mine")
+    record_message(change_log, "g2", "not mine")
+    change_log.record_membership("g3", "u1", joined=False)
+    clock.offset = 3
+
+    result = change_log.get_changes("u1", ["g1"], cursor)
+    assert [(c["type"], c["group_id"]) for c in result["changes"]] == [
+        ("message_created", "g1"), ("member_left", "g3")]
+    assert result["has_more"] is False
+    assert change_log.get_changes("u1", ["g1"], result["cursor"])["changes"] == []
+
+
+def test_recent_changes_are_held_back_until_they_settle(change_log, clock):
+    cursor = change_log.get_changes("u1", ["g1"])["cursor"]
+    record_message(change_log, "g1", "fresh")
+
+    held = change_log.get_changes("u1", ["g1"], cursor)
+    assert held["changes"] == []
+    clock.offset = 3
+    assert len(change_log.get_changes("u1", ["g1"], held["cursor"])["changes"]) == 1
+
+
+def test_paging_moves_the_cursor_to_the_last_returned_change(change_log, clock):
+    cursor = change_log.get_changes("u1", ["g1"])["cursor"]
+    ids = [record_message(change_log, "g1", str(i)) for i in range(3)]
+    clock.offset = 3
+
+    first = change_log.get_changes("u1", ["g1"], cursor, limit=2)
+    assert [c["id"] for c in first["changes"]] == ids[:2]
+    assert first["has_more"] is True and first["cursor"] == ids[1]
+    second = change_log.get_changes("u1", ["g1"], first["cursor"], limit=2)
+    assert [c["id"] for c in second["changes"]] == ids[2:]
+    assert second["has_more"] is False
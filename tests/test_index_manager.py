@@ -0,0 +1,17 @@
+from services.index_manager import IndexManager, required_indexes
+from services.user_service import UserService
+from services.group_service import GroupService
+from services.unread_service import UnreadCounterService
+
+
+def test_required_indexes_are_a_subset_of_the_declared_ones():
+    assert [index.document["name"] for index in required_indexes(UserService)] == ["username"]
+    assert required_indexes(GroupService) == []
+
+
+def test_only_required_indexes_are_created(make_repository):
+    repository = make_repository("unread_counters")
+    report = IndexManager([(repository, required_indexes(UnreadCounterService))]).ensure_indexes()
+
+    assert report["unread_counters"]["created"] == ["user_id_group_id"]
+    assert set(repository.collection.index_information()) == {"_id_", "user_id_group_id"}
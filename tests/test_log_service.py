@@ -0,0 +1,35 @@
+from services.log_service import LogService, BufferedLogWriter
+
+
+def test_buffered_logs_get_created_at(make_repository):
+    repository = make_repository("logs")
+    writer = BufferedLogWriter(repository, flush_size=10, flush_interval=0.01)
+    log_id = LogService(repository, writer).create_log("hello", "/api/x")
+    writer.flush()
+
+    stored = repository.find_by_id(log_id)
+    assert stored["message"] == "hello"
+    assert stored["created_at"] is not None
+    assert stored["updated_at"] is not None
+
+
+def test_synchronous_and_buffered_logs_have_the_same_fields(make_repository):
+    repository = make_repository("logs")
+    writer = BufferedLogWriter(repository, flush_size=10, flush_interval=0.01)
+    direct_id = LogService(repository).create_log("direct", "/api/x")
+    buffered_id = LogService(repository, writer).create_log("buffered", "/api/x")
+    writer.flush()
+
+    assert set(repository.find_by_id(direct_id)) == set(repository.find_by_id(buffered_id))
+
+
+def test_logs_written_after_close_get_created_at(make_repository):
+    repository = make_repository("logs")
+    writer = BufferedLogWriter(repository, flush_size=10, flush_interval=0.01)
+    writer.close()
+    log_id = LogService(repository, writer).create_log("late", "/api/x")
+
+    stored = repository.find_by_id(log_id)
+    assert stored["message"] == "late"
+    assert stored["created_at"] is not None
+    assert writer.stats()["written"] == 1
@@ -0,0 +1,43 @@
+from services.group_service import GroupService
+from services.membership_cache import MembershipCache
+
+
+def test_a_change_during_the_load_discards_the_fill():
+    cache = MembershipCache()
+    token = cache.begin_fill("g1")
+    cache.add_member("g1", "newbie")
+
+    assert cache.put("g1", {"owner"}, token) is False
+    assert cache.get("g1") is None
+    assert cache.put("g1", {"owner", "newbie"}, cache.begin_fill("g1")) is True
+    assert cache.get("g1") == {"owner", "newbie"}
+
+
+def test_concurrent_fills_are_tracked_separately():
+    cache = MembershipCache()
+    first = cache.begin_fill("g1")
+    second = cache.begin_fill("g1")
+    assert cache.put("g1", {"owner"}, second) is True
+    cache.remove_member("g1", "owner")
+
+    assert cache.put("g1", {"owner"}, first) is False
+    assert cache.get("g1") == frozenset()
+
+
+def test_member_added_while_the_group_is_loaded(make_repository):
+    service = GroupService(make_repository("groups"))
+    group_id = service.create_group("g", "owner")["id"]
+    service.membership_cache.clear()
+    load = service.membership_store.load_member_set
+
+    def load_racing_with_a_join(*args):
+        members = load(*args)
+        service.membership_store.add_member(group_id, "newbie")
+        service.membership_cache.add_member(group_id, "newbie")
+        return members
+
+    service.membership_store.load_member_set = load_racing_with_a_join
+    assert service.is_member(group_id, "owner")
+    service.membership_store.load_member_set = load
+
+    assert service.is_member(group_id, "newbie")
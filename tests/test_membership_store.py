@@ -0,0 +1,76 @@
+import pytest
+from services.membership_store import EmbeddedMembershipStore, CollectionMembershipStore
+
+
+@pytest.fixture(params=["embedded", "collection"])
+def setup(request, make_repository):
+    groups = make_repository("groups")
+    if request.param == "embedded":
+        store = EmbeddedMembershipStore(groups)
+    else:
+        store = CollectionMembershipStore(make_repository("group_members"), groups)
+    group_id = groups.create(dict(store.initial_group_fields("owner"), name="g"))
+    store.group_created(group_id, "owner")
+    return store, groups, group_id
+
+
+def test_members_and_admins(setup):
+    store, groups, group_id = setup
+    assert store.add_member(group_id, "u1") is True
+    assert store.is_member(group_id, "u1")
+    assert store.is_admin(group_id, "owner")
+    assert not store.is_admin(group_id, "u1")
+
+    assert store.add_admin(group_id, "u1")
+    assert store.is_admin(group_id, "u1")
+    assert store.remove_member(group_id, "u1") is True
+    assert not store.is_member(group_id, "u1")
+    assert not store.is_admin(group_id, "u1")
+    assert store.get_member_ids(group_id) == ["owner"]
+
+
+def test_adding_a_member_twice_is_a_no_op(setup):
+    store, groups, group_id = setup
+    assert store.add_member(group_id, "u1") is True
+    store.add_member(group_id, "u1")
+    assert sorted(store.get_member_ids(group_id)) == ["owner", "u1"]
+    assert store.load_member_set(group_id, 10) == frozenset({"owner", "u1"})
+
+
+def test_list_members_pages_by_user_id(setup):
+    store, groups, group_id = setup
+    for user_id in ("u3", "u1", "u2"):
+        store.add_member(group_id, user_id)
+
+    first = store.list_members(group_id, limit=2)
+    assert [(m["user_id"], m["role"]) for m in first] == [("owner", "admin"), ("u1", "member")]
+    assert [m["user_id"] for m in store.list_members(group_id, limit=2, after="u1")] == ["u2", "u3"]
+    assert sorted(store.get_user_group_ids("u2")) == [group_id]
+
+
+def test_collection_store_counts_members_without_the_unique_index(make_repository):
+    groups = make_repository("groups")
+    members = make_repository("group_members")
+    store = CollectionMembershipStore(members, groups)
+    group_id = groups.create(dict(store.initial_group_fields("owner"), name="g"))
+    store.group_created(group_id, "owner")
+
+    assert store.add_member(group_id, "u1") is True
+    assert store.add_member(group_id, "u1") is False
+    assert groups.find_by_id(group_id)["member_count"] == 2
+    assert members.count({"group_id": group_id}) == 2
+    assert store.add_member("5f0000000000000000000000", "u1") is False
+    assert store.load_member_set(group_id, 1) is None
+
+
+def test_migration_from_embedded_is_idempotent(make_repository):
+    groups = make_repository("groups")
+    members = make_repository("group_members")
+    group_id = groups.create({"name": "g", "members": ["a", "b"], "admins": ["a"]})
+    store = CollectionMembershipStore(members, groups)
+
+    assert store.migrate_from_embedded() == 1
+    assert store.migrate_from_embedded() == 0
+    group = groups.find_by_id(group_id)
+    assert group["member_count"] == 2 and "members" not in group
+    assert store.is_admin(group_id, "a") and store.is_member(group_id, "b") and not store.is_admin(group_id, "b")
@@ -0,0 +1,77 @@
+import datetime
+from services.message_cache import RecentMessageCache
+
+
+def message(number):
+    created_at = datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=number)
+    return created_at, {"id": f"m{number}", "content": f"message {number}", "read_by": []}
+
+
+def test_fill_then_serve_and_write_through():
+    cache = RecentMessageCache(max_messages=3)
+    assert cache.get_latest("g1", 2) is None
+
+    cache.fill("g1", [message(1), message(2)], cache.begin_fill("g1"))
+    assert [m["id"] for m in cache.get_latest("g1", 3)] == ["m1", "m2"]
+
+    cache.add("g1", *message(3))
+    cache.add("g1", *message(4))
+    assert [m["id"] for m in cache.get_latest("g1", 3)] == ["m2", "m3", "m4"]
+    # The oldest message was pushed out, so a larger page is no longer complete
+    assert cache.get_latest("g1", 4) is None
+
+
+def test_a_fill_overtaken_by_a_write_is_discarded():
+    cache = RecentMessageCache(max_messages=3)
+    token = cache.begin_fill("g1")
+    # A message is sent while the latest page is being loaded
+    cache.add("g1", *message(2))
+    cache.fill("g1", [message(1)], token)
+
+    assert cache.get_latest("g1", 1) is None
+    cache.fill("g1", [message(1), message(2)], cache.begin_fill("g1"))
+    assert [m["id"] for m in cache.get_latest("g1", 2)] == ["m1", "m2"]
+
+
+def test_only_fills_in_progress_become_stale():
+    cache = RecentMessageCache(max_messages=3)
+    cache.mark_read("g1", "u1")
+    token = cache.begin_fill("g1")
+    cache.add("g2", *message(5))
+    cache.fill("g1", [message(1)], token)
+
+    assert [m["id"] for m in cache.get_latest("g1", 1)] == ["m1"]
+
+
+def test_read_marks_do_not_change_handed_out_messages():
+    cache = RecentMessageCache(max_messages=3)
+    cache.fill("g1", [message(1)], cache.begin_fill("g1"))
+    page = cache.get_latest("g1", 1)
+    cache.mark_read("g1", "u1", message_id="m1")
+
+    assert page[0]["read_by"] == []
+    assert cache.get_latest("g1", 1)[0]["read_by"] == ["u1"]
+
+
+def test_groups_are_evicted_least_recently_used_first():
+    cache = RecentMessageCache(max_messages=3, max_groups=2)
+    for group_id in ("g1", "g2"):
+        cache.fill(group_id, [message(1)], cache.begin_fill(group_id))
+    cache.get_latest("g1", 1)
+    cache.fill("g3", [message(1)], cache.begin_fill("g3"))
+
+    assert cache.get_latest("g2", 1) is None
+    assert cache.get_latest("g1", 1) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_a_fill_repairs_a_buffer_a_delete_left_short():
+    cache = RecentMessageCache(max_messages=3)
+    cache.fill("g1", [message(1), message(2), message(3)], cache.begin_fill("g1"))
+    cache.add("g1", *message(4))
+    cache.remove("g1", "m4")
+    assert cache.get_latest("g1", 3) is None
+
+    cache.fill("g1", [message(1), message(2), message(3)], cache.begin_fill("g1"))
+    assert [m["id"] for m in cache.get_latest("g1", 3)] == ["m1", "m2", "m3"]
+    assert cache.stats()["groups"] == 1
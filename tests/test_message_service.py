@@ -0,0 +1,31 @@
+import pytest
+from pymongo.errors import OperationFailure
+from services.message_service import MessageService
+
+
+@pytest.fixture
+def service(make_repository):
+    return MessageService(make_repository("messages"))
+
+
+def test_search_falls_back_to_substring_search_without_text_index(service, monkeypatch):
+    def missing_index(*args):
+        raise OperationFailure("text index required for $text query", code=27)
+
+    monkeypatch.setattr(service, "_text_search", missing_index)
+    service.create_message("u1", "g1", "Lunch at noon?")
+    service.create_message("u2", "g1", "Sure, lunch works")
+    service.create_message("u1", "g2", "lunch elsewhere")
+
+    result = service.search("LUNCH", ["g1"], limit=1)
+    assert [m["content"] for m in result["results"]] == ["Sure, lunch works"]
+    assert result["has_more"] is True
+    assert len(service.search("lunch", ["g1", "g2"])["results"]) == 3
+
+
+def test_substring_search_matches_input_literally(service):
+    service.create_message("u1", "g1", "what (is) this?")
+    service.create_message("u1", "g1", "whatever")
+
+    assert [m["content"] for m in service.search("(is) this?", ["g1"])["results"]] == ["what (is) this?"]
+    assert service.search("what.*", ["g1"])["results"] == []
@@ -0,0 +1,54 @@
+import threading
+import pytest
+from services.mongo_client_registry import MongoClientRegistry
+
+
+class FakeClient:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.closed = False
+        self.admin = self
+
+    def command(self, name):
+        if self.fail:
+            raise ConnectionError("no server")
+
+    def close(self):
+        self.closed = True
+
+
+def test_a_client_that_fails_the_ping_is_closed(monkeypatch):
+    registry = MongoClientRegistry()
+    created = []
+    monkeypatch.setattr("services.mongo_client_registry.MongoClient",
+                        lambda *args, **kwargs: created.append(FakeClient(fail=True)) or created[-1])
+
+    with pytest.raises(ConnectionError):
+        registry.get_client("mongodb://down.invalid/")
+    assert created[0].closed
+    assert registry.pool_stats()["clients"] == 0
+
+
+def test_concurrent_first_use_shares_one_client(monkeypatch):
+    registry = MongoClientRegistry()
+    created = []
+    barrier = threading.Barrier(4)
+
+    def connect(*args, **kwargs):
+        client = FakeClient()
+        created.append(client)
+        barrier.wait()
+        return client
+
+    monkeypatch.setattr("services.mongo_client_registry.MongoClient", connect)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_client("mongodb://db.invalid/")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, results))) == 1
+    assert sum(not client.closed for client in created) == 1
+    assert not results[0].closed
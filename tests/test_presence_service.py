@@ -0,0 +1,67 @@
+import datetime
+import pytest
+from services.presence_service import PresenceEngine
+from services.socket_registry import InMemorySocketRegistry, RedisSocketRegistry
+
+
+@pytest.fixture
+def users(make_repository):
+    return make_repository("users")
+
+
+def add_user(users, status):
+    return users.create({"username": f"user-{status}", "status": status})
+
+
+def test_flush_writes_status_and_last_active_in_one_batch(users):
+    engine = PresenceEngine(InMemorySocketRegistry(), users)
+    first, second = add_user(users, "offline"), add_user(users, "online")
+    engine.record_status(first, "online")
+    engine.record_status(second)
+
+    assert engine.flush() == 2
+    assert users.find_by_id(first)["status"] == "online"
+    assert users.find_by_id(second)["last_active"] is not None
+    assert engine.stats()["pending_writes"] == 0
+
+
+def test_flush_does_not_overwrite_a_newer_stored_status(users):
+    engine = PresenceEngine(InMemorySocketRegistry(), users)
+    user_id = add_user(users, "offline")
+    engine.record_status(user_id, "offline")
+
+    # Another worker wrote the reconnect after our change was queued
+    later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=5)
+    users.update_by_id(user_id, {"status": "online", "last_active": later})
+    engine.flush()
+
+    assert users.find_by_id(user_id)["status"] == "online"
+
+
+def test_reconcile_fixes_statuses_in_both_directions(users):
+    registry = InMemorySocketRegistry()
+    engine = PresenceEngine(registry, users)
+    ghost = add_user(users, "online")
+    connected = add_user(users, "offline")
+    registry.add_socket("s1", connected)
+
+    assert engine.reconcile() == 2
+    engine.flush()
+    assert users.find_by_id(ghost)["status"] == "offline"
+    assert users.find_by_id(connected)["status"] == "online"
+    assert engine.reconcile() == 0
+
+
+def test_sockets_of_a_dead_worker_expire():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    dead = PresenceEngine(RedisSocketRegistry(fakeredis.FakeRedis(server=server, decode_responses=True)), timeout=30)
+    alive = PresenceEngine(RedisSocketRegistry(fakeredis.FakeRedis(server=server, decode_responses=True)), timeout=30)
+    dead.connect("s1", "u1")
+    alive.connect("s2", "u2")
+
+    now = datetime.datetime.now().timestamp()
+    assert alive.expire(now + 10) == []
+    assert alive.expire(now + 31) == ["u1"]
+    assert alive.online_user_ids() == ["u2"]
+    assert alive.stats()["expired"] == 1
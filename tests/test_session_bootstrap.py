@@ -0,0 +1,81 @@
+import queue
+import threading
+from services.session_bootstrap import SessionAdmissionQueue, StatusNotifier
+from services.user_service import UserService
+
+
+def start_thread(target):
+    threading.Thread(target=target, daemon=True).start()
+
+
+def test_admission_queue_coalesces_sockets_and_rejects_when_full():
+    handled = []
+    done = threading.Event()
+    admission = SessionAdmissionQueue(lambda user_id, sids: (handled.append((user_id, sorted(sids))), done.set()),
+                                      queue.Queue, start_thread, workers=1, max_pending=1)
+
+    assert admission.submit("u1", "s1") is True
+    assert admission.submit("u1", "s2") is True
+    assert admission.submit("u2", "s3") is False
+    admission.start()
+    assert done.wait(5)
+
+    assert handled == [("u1", ["s1", "s2"])]
+    stats = admission.stats()
+    assert (stats["admitted"], stats["coalesced"], stats["rejected"]) == (1, 1, 1)
+
+
+def test_admission_queue_survives_a_failing_bootstrap():
+    calls = []
+    second = threading.Event()
+
+    def handler(user_id, sids):
+        calls.append(user_id)
+        if user_id == "bad":
+            raise RuntimeError("boom")
+        second.set()
+
+    admission = SessionAdmissionQueue(handler, queue.Queue, start_thread, workers=1)
+    admission.start()
+    admission.submit("bad", "s1")
+    admission.submit("good", "s2")
+    assert second.wait(5)
+    assert calls == ["bad", "good"]
+    assert admission.stats()["failed"] == 1
+
+
+def make_notifier(make_repository):
+    users = UserService(make_repository("users"))
+    alice = users.create_user("alice", "pw")["id"]
+    bob = users.create_user("bob", "pw")["id"]
+    carol = users.create_user("carol", "pw")["id"]
+    users.add_friend(alice, bob)
+    users.add_friend(alice, carol)
+    delivered = []
+    notifier = StatusNotifier(users, lambda changes, recipients: delivered.append((changes, sorted(recipients))))
+    return notifier, delivered, alice, bob, carol
+
+
+def test_status_notifier_drops_a_reconnect_within_the_window(make_repository):
+    notifier, delivered, alice, bob, carol = make_notifier(make_repository)
+    notifier.notify(alice, "offline")
+    notifier.notify(alice, "online")
+
+    assert notifier.flush() == 0
+    assert delivered == []
+    assert notifier.stats()["deduplicated"] == 1
+
+
+def test_status_notifier_batches_recipients_with_the_same_changes(make_repository):
+    notifier, delivered, alice, bob, carol = make_notifier(make_repository)
+    notifier.notify(alice, "online")
+    notifier.notify(alice, "offline")
+    notifier.notify(alice, "online")
+    notifier.notify(bob, "online")
+
+    assert notifier.flush() == 2
+    assert {tuple(recipients): changes for changes, recipients in delivered} == {
+        tuple(sorted([bob, carol])): [{"user_id": alice, "status": "online"}],
+        (alice,): [{"user_id": bob, "status": "online"}]
+    }
+    assert notifier.stats()["batches"] == 2
@@ -0,0 +1,113 @@
+import threading
+import pytest
+from services.socket_registry import InMemorySocketRegistry, RedisSocketRegistry
+
+
+@pytest.fixture(params=["memory", "redis"])
+def registry(request):
+    if request.param == "memory":
+        return InMemorySocketRegistry()
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisSocketRegistry(fakeredis.FakeRedis(decode_responses=True))
+
+
+def test_first_and_last_socket_of_a_user(registry):
+    assert registry.add_socket("s1", "u1") is True
+    assert registry.add_socket("s2", "u1") is False
+    assert registry.get_user("s2") == "u1"
+    assert registry.get_sockets("u1") == {"s1", "s2"}
+    assert registry.online_user_ids() == {"u1"}
+
+    assert registry.remove_socket("s1") == ("u1", False)
+    assert registry.is_online("u1")
+    assert registry.remove_socket("s2") == ("u1", True)
+    assert not registry.is_online("u1")
+    assert registry.socket_count() == 0
+    assert registry.user_count() == 0
+
+
+def test_removing_an_unknown_socket(registry):
+    assert registry.remove_socket("missing") == (None, False)
+
+
+def test_second_removal_does_not_report_offline_again(registry):
+    registry.add_socket("s1", "u1")
+    assert registry.remove_socket("s1") == ("u1", True)
+    assert registry.remove_socket("s1") == (None, False)
+
+
+def test_concurrent_removals_report_offline_once(registry):
+    for attempt in range(50):
+        sid = f"s{attempt}"
+        registry.add_socket(sid, "u1")
+        results = []
+        barrier = threading.Barrier(8)
+
+        def remove():
+            barrier.wait()
+            results.append(registry.remove_socket(sid))
+
+        threads = [threading.Thread(target=remove) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count(("u1", True)) == 1
+        assert not registry.is_online("u1")
+
+
+def test_heartbeats_and_stale_sockets(registry):
+    registry.add_socket("s1", "u1")
+    registry.add_socket("s2", "u2")
+    registry.touch(["s1", "s2"], 100.0)
+    registry.touch(["s2"], 200.0)
+    assert registry.stale_sockets(150.0) == ["s1"]
+
+    registry.remove_socket("s1")
+    assert registry.stale_sockets(1000.0) == ["s2"]
+
+
+def test_local_sockets(registry):
+    registry.add_socket("s1", "u1")
+    registry.add_socket("s2", "u1")
+    assert registry.get_local_sockets("u1") == {"s1", "s2"}
+    assert sorted(registry.local_socket_ids()) == ["s1", "s2"]
+
+
+def test_redis_registries_share_state():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker1 = RedisSocketRegistry(fakeredis.FakeRedis(server=server, decode_responses=True))
+    worker2 = RedisSocketRegistry(fakeredis.FakeRedis(server=server, decode_responses=True))
+
+    assert worker1.add_socket("s1", "u1") is True
+    assert worker2.add_socket("s2", "u1") is False
+    assert worker2.get_sockets("u1") == {"s1", "s2"}
+    # Only sockets connected to the process itself are local
+    assert worker1.local_socket_ids() == ["s1"]
+
+    assert worker1.remove_socket("s1") == ("u1", False)
+    assert worker1.remove_socket("s2") == ("u1", True)
+    assert worker2.online_user_ids() == set()
+
+
+def test_removal_racing_another_worker_reports_offline_once():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker1 = RedisSocketRegistry(fakeredis.FakeRedis(server=server, decode_responses=True))
+    worker2 = RedisSocketRegistry(fakeredis.FakeRedis(server=server, decode_responses=True))
+    worker1.add_socket("s1", "u1")
+
+    # worker2 removes the socket right after worker1 has looked up its user
+    other = []
+    hget = worker1.client.hget
+
+    def racing_hget(*args):
+        value = hget(*args)
+        if not other:
+            other.append(worker2.remove_socket("s1"))
+        return value
+
+    worker1.client.hget = racing_hget
+    assert worker1.remove_socket("s1") == (None, False)
+    assert other == [("u1", True)]
@@ -0,0 +1,33 @@
+from services.group_service import GroupService
+from services.typing_service import TypingStateStore
+from services.user_service import UserService
+
+
+def test_group_responses_take_typing_users_from_memory(make_repository):
+    groups = make_repository("groups")
+    typing_state = TypingStateStore()
+    service = GroupService(groups, typing_state=typing_state)
+    group_id = service.create_group("Book club", "owner")["id"]
+    # Left behind by the old database-backed typing indicator
+    groups.update_by_id(group_id, {"typing_users": ["ghost"]})
+    typing_state.start(group_id, "owner")
+
+    assert service.get_group(group_id)["typing_users"] == ["owner"]
+    assert service.get_public_groups()[0]["typing_users"] == ["owner"]
+    assert service.search_groups("book")[0]["typing_users"] == ["owner"]
+    assert service.get_user_groups("owner")[0]["typing_users"] == ["owner"]
+    typing_state.stop(group_id, "owner")
+    assert service.get_group(group_id)["typing_users"] == []
+
+
+def test_user_responses_take_is_typing_in_from_memory(make_repository):
+    users = make_repository("users")
+    typing_state = TypingStateStore()
+    service = UserService(users, typing_state=typing_state)
+    user_id = service.create_user("alice", "pw")["id"]
+    users.update_by_id(user_id, {"is_typing_in": ["stale-group"]})
+
+    assert service.find_by_id(user_id)["is_typing_in"] == []
+    typing_state.start("g1", user_id)
+    assert service.find_by_id(user_id)["is_typing_in"] == ["g1"]
+    assert typing_state.clear_user(user_id) == ["g1"]